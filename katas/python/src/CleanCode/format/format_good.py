@@ -1,9 +1,52 @@
 # Cumplimiento de Clean Code: Buen Formato
 # ✅ Solución: Formato horizontal y vertical correcto
 
-from typing import Dict, List, Any, Optional, TypedDict
-from datetime import datetime
-
+import asyncio
+import contextlib
+import csv
+import hashlib
+import io
+import itertools
+import json
+import math
+import mmap
+import multiprocessing
+import operator
+import os
+import random
+import struct
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import weakref
+import zlib
+from abc import ABC, abstractmethod
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from collections import Counter, OrderedDict, defaultdict
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+from multiprocessing.shared_memory import SharedMemory
+from types import MappingProxyType
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    TypedDict,
+    Union,
+    get_type_hints,
+)
+from datetime import datetime, timedelta
 
 # ✅ Líneas cortas (idealmente max 80-100 caracteres)
 # ✅ Espaciado apropiado entre operadores y elementos
@@ -20,9 +63,1111 @@ class Product(TypedDict):
     discounted_price: Optional[float]
 
 
-class ProductService:
+# ✅ Vista de solo lectura: sin copiar el producto, solo sobreescribe el descuento
+class ProductView(Mapping):
+    __slots__ = ("_product", "_discounted_price")
+
+    def __init__(self, product: Product, discounted_price: Optional[float]):
+        self._product = product
+        self._discounted_price = discounted_price
+
+    def __getitem__(self, key: str) -> Any:
+        if key == "discounted_price":
+            return self._discounted_price
+        return self._product[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._product)
+
+    def __len__(self) -> int:
+        return len(self._product)
+
+    def __repr__(self) -> str:
+        return f"ProductView({dict(self)!r})"
+
+
+# ✅ Índice ordenado por precio: rangos con bisect y top-N sin ordenar en cada consulta
+class SortedPriceIndex:
+    def __init__(self, entries: Iterable[Tuple[float, int]] = ()):
+        self._entries: List[Tuple[float, int]] = sorted(entries)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, price: float, product_id: int) -> None:
+        insort(self._entries, (price, product_id))
+
+    def remove(self, price: float, product_id: int) -> None:
+        entry = (price, product_id)
+        position = bisect_left(self._entries, entry)
+        if position < len(self._entries) and self._entries[position] == entry:
+            del self._entries[position]
+
+    # ✅ Se recorre una copia del tramo: cambiar precios mientras se itera no mueve nada
+    def between(self, low: float, high: float) -> Iterator[int]:
+        start = bisect_left(self._entries, (low, -math.inf))
+        stop = bisect_right(self._entries, (high, math.inf))
+        return (product_id for _, product_id in self._entries[start:stop])
+
+    def cheapest(self, limit: int) -> Iterator[int]:
+        return (product_id for _, product_id in self._entries[:limit])
+
+
+# ✅ Índice invertido de trigramas sobre nombres: subcadenas y prefijos aproximados
+# ✅ Las listas de ids son arrays ordenados de enteros, no listas de objetos
+class NameSearchIndex:
+    GRAM_SIZE = 3
+    MIN_SIMILARITY = 0.5
+
+    def __init__(self):
+        self._postings: Dict[str, array] = {}
+        self._names: Dict[int, str] = {}
+
+    def add(self, product_id: int, name: str) -> None:
+        self.remove(product_id)
+
+        normalized = name.casefold()
+        self._names[product_id] = normalized
+        for gram in self._grams(normalized, padded=True):
+            postings = self._postings.setdefault(gram, array("q"))
+            if not postings or postings[-1] < product_id:
+                postings.append(product_id)
+            else:
+                postings.insert(bisect_left(postings, product_id), product_id)
+
+    def remove(self, product_id: int) -> None:
+        normalized = self._names.pop(product_id, None)
+        if normalized is None:
+            return
+
+        for gram in self._grams(normalized, padded=True):
+            postings = self._postings[gram]
+            del postings[bisect_left(postings, product_id)]
+            if not postings:
+                del self._postings[gram]
+
+    # ✅ Subcadena exacta: intersección de listas empezando por la más corta
+    def find_substring(self, query: str) -> List[int]:
+        normalized = query.casefold()
+        grams = self._grams(normalized, padded=False)
+        if not grams:
+            return [pid for pid, name in self._names.items() if normalized in name]
+
+        postings = sorted(
+            (self._postings.get(gram, array("q")) for gram in grams), key=len
+        )
+        candidates = set(postings[0])
+        for other in postings[1:]:
+            candidates.intersection_update(other)
+
+        return sorted(pid for pid in candidates if normalized in self._names[pid])
+
+    # ✅ Búsqueda aproximada por prefijo: ordena por trigramas compartidos
+    def search(self, query: str, limit: int = 10) -> List[int]:
+        normalized = query.casefold()
+        grams = self._grams(normalized, padded=True)
+        if not grams:
+            return []
+
+        shared = Counter()
+        for gram in grams:
+            shared.update(self._postings.get(gram, ()))
+
+        scored = []
+        for product_id, matches in shared.items():
+            similarity = matches / len(grams)
+            if similarity < self.MIN_SIMILARITY:
+                continue
+
+            name = self._names[product_id]
+            scored.append(
+                (
+                    -name.startswith(normalized),
+                    -(normalized in name),
+                    -similarity,
+                    len(name),
+                    product_id,
+                )
+            )
+
+        return [entry[-1] for entry in sorted(scored)[:limit]]
+
+    def _grams(self, text: str, padded: bool) -> Set[str]:
+        if padded:
+            text = " " * (self.GRAM_SIZE - 1) + text
+        size = self.GRAM_SIZE
+        return {text[i : i + size] for i in range(len(text) - size + 1)}
+
+
+# ✅ Catálogo indexado: búsqueda por id en O(1) e índices secundarios
+# ✅ Los índices secundarios guardan ids, así cambiar stock o precio no los invalida
+class ProductCatalog:
+    REBUILD_INDEX_RATIO = 0.1
+
+    def __init__(self, products: Iterable[Product] = (), lazy_indexes: bool = False):
+        self._products_by_id: Dict[int, Product] = {}
+        self._ids_by_category: Dict[str, Dict[int, None]] = defaultdict(dict)
+        self._ids_by_supplier: Dict[str, Dict[int, None]] = defaultdict(dict)
+        self._name_index = NameSearchIndex()
+        self._price_index = SortedPriceIndex()
+        self._price_index_by_category: Dict[str, SortedPriceIndex] = defaultdict(
+            SortedPriceIndex
+        )
+
+        # ✅ La carga inicial indexa al final, de una vez, no producto a producto
+        self._indexes_ready = False
+        for product in products:
+            self.add(product)
+
+        if not lazy_indexes:
+            self._ensure_indexes()
+
+    def __len__(self) -> int:
+        return len(self._products_by_id)
+
+    def __iter__(self) -> Iterator[Product]:
+        return iter(self._products_by_id.values())
+
+    def __contains__(self, product_id: object) -> bool:
+        return product_id in self._products_by_id
+
+    # ✅ Grupo 1: Lecturas
+    def get(self, product_id: int) -> Optional[Product]:
+        return self._products_by_id.get(product_id)
+
+    def find_by_category(self, category: str) -> Iterator[Product]:
+        self._ensure_indexes()
+        return self._resolve(self._ids_by_category.get(category, {}))
+
+    def find_by_supplier(self, supplier: str) -> Iterator[Product]:
+        self._ensure_indexes()
+        return self._resolve(self._ids_by_supplier.get(supplier, {}))
+
+    # ✅ El precio indexado es el precio con descuento cuando existe
+    def find_by_price_range(
+        self, low: float, high: float, category: Optional[str] = None
+    ) -> Iterator[Product]:
+        return self._resolve(self._price_index_for(category).between(low, high))
+
+    def find_cheapest(
+        self, limit: int, category: Optional[str] = None
+    ) -> Iterator[Product]:
+        return self._resolve(self._price_index_for(category).cheapest(limit))
+
+    def find_by_name(self, query: str) -> Iterator[Product]:
+        self._ensure_indexes()
+        return self._resolve(self._name_index.find_substring(query))
+
+    def search_by_name(self, query: str, limit: int = 10) -> Iterator[Product]:
+        self._ensure_indexes()
+        return self._resolve(self._name_index.search(query, limit))
+
+    def _price_index_for(self, category: Optional[str]) -> SortedPriceIndex:
+        self._ensure_indexes()
+        if category is None:
+            return self._price_index
+
+        return self._price_index_by_category.get(category, SortedPriceIndex())
+
+    def _resolve(self, product_ids: Iterable[int]) -> Iterator[Product]:
+        return (self.get(product_id) for product_id in product_ids)
+
+    # ✅ Foto fija del catálogo: aquí es una copia, el catálogo versionado no copia
+    def snapshot(self) -> "CatalogSnapshot":
+        return CatalogSnapshot.from_products(dict(product) for product in self)
+
+    # ✅ Grupo 2: Escrituras (toda mutación pasa por aquí)
+    def add(self, product: Product) -> None:
+        previous = self.get(product["id"])
+        if previous is not None:
+            self._unindex(previous)
+
+        self._store(product)
+        self._index(product)
+
+    def update_stock(self, product_id: int, delta: int) -> Product:
+        product = self._require(product_id)
+        self._set_field(product_id, "stock", product["stock"] + delta)
+        return self._require(product_id)
+
+    def update_price(self, product_id: int, price: float) -> Product:
+        return self._set_price_field(product_id, "price", price)
+
+    def rename(self, product_id: int, name: str) -> Product:
+        self._require(product_id)
+        self._set_field(product_id, "name", name)
+        if self._indexes_ready:
+            self._name_index.add(product_id, name)
+        return self._require(product_id)
+
+    # ✅ Reprecio masivo: valida todos los ids antes de mutar nada
+    # ✅ Si el lote toca una parte grande del catálogo, reordena el índice una vez
+    def bulk_update(
+        self,
+        product_ids: Sequence[int],
+        discount_rate: float,
+        quantities: Optional[Sequence[int]] = None,
+    ) -> None:
+        self._check_quantities(product_ids, quantities)
+        products = [self._require(product_id) for product_id in product_ids]
+        rebuild_index = len(products) > len(self) * self.REBUILD_INDEX_RATIO
+
+        for product in products:
+            discounted_price = product["price"] * discount_rate
+            if rebuild_index:
+                self._set_field(product["id"], "discounted_price", discounted_price)
+            else:
+                self._set_price_field(
+                    product["id"], "discounted_price", discounted_price
+                )
+
+        for product, quantity in zip(products, quantities or ()):
+            self._set_field(product["id"], "stock", product["stock"] - quantity)
+
+        if rebuild_index:
+            self._rebuild_price_indexes()
+
+    def reprice_all(self, discount_rate: float, workers: int = 1) -> None:
+        self.bulk_update([product["id"] for product in self], discount_rate)
+
+    def _set_price_field(self, product_id: int, field: str, value: float) -> Product:
+        self._unindex_price(self._require(product_id))
+        self._set_field(product_id, field, value)
+
+        product = self._require(product_id)
+        self._index_price(product)
+        return product
+
+    def _store(self, product: Product) -> None:
+        self._products_by_id[product["id"]] = product
+
+    def _set_field(self, product_id: int, field: str, value: Any) -> None:
+        self._products_by_id[product_id][field] = value
+
+    def _require(self, product_id: int) -> Product:
+        product = self.get(product_id)
+        if product is None:
+            raise KeyError(f"Producto desconocido: {product_id}")
+        return product
+
+    # ✅ Una cantidad por producto: con longitudes distintas no se toca nada
+    @staticmethod
+    def _check_quantities(
+        product_ids: Sequence[int], quantities: Optional[Sequence[int]]
+    ) -> None:
+        if quantities is not None and len(quantities) != len(product_ids):
+            raise ValueError(
+                f"Se esperaban {len(product_ids)} cantidades, no {len(quantities)}"
+            )
+
+    # ✅ Grupo 3: Mantenimiento de índices secundarios
+    def _ensure_indexes(self) -> None:
+        if self._indexes_ready:
+            return
+
+        self._indexes_ready = True
+        for product in self:
+            self._index_attributes(product)
+        self._rebuild_price_indexes()
+
+    def _index(self, product: Product) -> None:
+        if not self._indexes_ready:
+            return
+
+        self._index_attributes(product)
+        self._index_price(product)
+
+    def _index_attributes(self, product: Product) -> None:
+        self._ids_by_category[product["category"]][product["id"]] = None
+        self._ids_by_supplier[product["supplier"]][product["id"]] = None
+        self._name_index.add(product["id"], product["name"])
+
+    def _unindex(self, product: Product) -> None:
+        if not self._indexes_ready:
+            return
+
+        self._discard(self._ids_by_category, product["category"], product["id"])
+        self._discard(self._ids_by_supplier, product["supplier"], product["id"])
+        self._name_index.remove(product["id"])
+        self._unindex_price(product)
+
+    def _index_price(self, product: Product) -> None:
+        self._add_price_entry(
+            product["id"], product["category"], self._price_key(product)
+        )
+
+    def _unindex_price(self, product: Product) -> None:
+        self._remove_price_entry(
+            product["id"], product["category"], self._price_key(product)
+        )
+
+    def _add_price_entry(self, product_id: int, category: str, price: float) -> None:
+        if not self._indexes_ready:
+            return
+
+        self._price_index.add(price, product_id)
+        self._price_index_by_category[category].add(price, product_id)
+
+    def _remove_price_entry(self, product_id: int, category: str, price: float) -> None:
+        if not self._indexes_ready:
+            return
+
+        self._price_index.remove(price, product_id)
+        category_index = self._price_index_by_category.get(category)
+        if category_index is not None:
+            category_index.remove(price, product_id)
+            if not category_index:
+                del self._price_index_by_category[category]
+
+    # ✅ Tras cambios masivos es más barato reordenar todo que insertar uno a uno
+    def _rebuild_price_indexes(self) -> None:
+        if not self._indexes_ready:
+            return
+
+        entries_by_category: Dict[str, List[Tuple[float, int]]] = defaultdict(list)
+        for category, price, product_id in self._price_entries():
+            entries_by_category[category].append((price, product_id))
+
+        self._price_index = SortedPriceIndex(
+            itertools.chain.from_iterable(entries_by_category.values())
+        )
+        self._price_index_by_category = defaultdict(
+            SortedPriceIndex,
+            {
+                category: SortedPriceIndex(entries)
+                for category, entries in entries_by_category.items()
+            },
+        )
+
+    def _price_entries(self) -> Iterator[Tuple[str, float, int]]:
+        for product in self:
+            yield product["category"], self._price_key(product), product["id"]
+
+    @staticmethod
+    def _price_key(product: Product) -> float:
+        if product.get("discounted_price") is not None:
+            return product["discounted_price"]
+        return product["price"]
+
+    def _discard(
+        self, index: Dict[str, Dict[int, None]], key: str, product_id: int
+    ) -> None:
+        bucket = index.get(key)
+        if bucket is None:
+            return
+
+        bucket.pop(product_id, None)
+        if not bucket:
+            del index[key]
+
+
+# ✅ Catálogo columnar: precio, stock y precio con descuento en arrays contiguos
+# ✅ El reprecio masivo recorre las columnas en una sola pasada, sin dicts intermedios
+class ColumnarProductCatalog(ProductCatalog):
+    NO_DISCOUNT = math.nan
+
+    def __init__(self, products: Iterable[Product] = ()):
+        self._rows: Dict[int, int] = {}
+        self._details: List[Dict[str, Any]] = []
+        self._prices = array("d")
+        self._stocks = array("q")
+        self._discounted_prices = array("d")
+
+        super().__init__(products)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __iter__(self) -> Iterator[Product]:
+        return (self._materialize(row) for row in self._rows.values())
+
+    def __contains__(self, product_id: object) -> bool:
+        return product_id in self._rows
+
+    def get(self, product_id: int) -> Optional[Product]:
+        row = self._rows.get(product_id)
+        if row is None:
+            return None
+
+        return self._materialize(row)
+
+    def bulk_update(
+        self,
+        product_ids: Sequence[int],
+        discount_rate: float,
+        quantities: Optional[Sequence[int]] = None,
+    ) -> None:
+        self._check_quantities(product_ids, quantities)
+        rows = [self._rows[product_id] for product_id in product_ids]
+        prices = self._prices
+        stocks = self._stocks
+        discounted_prices = self._discounted_prices
+        rebuild_index = len(rows) > len(self) * self.REBUILD_INDEX_RATIO
+
+        if not rebuild_index:
+            for product_id, row in zip(product_ids, rows):
+                category = self._details[row]["category"]
+                self._remove_price_entry(product_id, category, self._row_price(row))
+
+        for row in rows:
+            discounted_prices[row] = prices[row] * discount_rate
+
+        if rebuild_index:
+            self._rebuild_price_indexes()
+        else:
+            for product_id, row in zip(product_ids, rows):
+                category = self._details[row]["category"]
+                self._add_price_entry(product_id, category, discounted_prices[row])
+
+        for row, quantity in zip(rows, quantities or ()):
+            stocks[row] -= quantity
+
+    # ✅ Reprecio de todo el catálogo repartido entre procesos
+    # ✅ Los precios viajan en memoria compartida: no se serializa ningún producto
+    def reprice_all(self, discount_rate: float, workers: int = 1) -> None:
+        count = len(self._prices)
+        if workers <= 1 or count == 0:
+            self._discounted_prices = array(
+                "d", (discount_rate * price for price in self._prices)
+            )
+            self._rebuild_price_indexes()
+            return
+
+        column_bytes = count * self._prices.itemsize
+        shared = SharedMemory(create=True, size=2 * column_bytes)
+        try:
+            shared.buf[:column_bytes] = memoryview(self._prices).cast("B")
+            chunk = -(-count // workers)
+            partitions = [
+                (
+                    shared.name,
+                    column_bytes,
+                    start,
+                    min(start + chunk, count),
+                    discount_rate,
+                )
+                for start in range(0, count, chunk)
+            ]
+
+            with multiprocessing.Pool(workers) as pool:
+                pool.starmap(_reprice_partition, partitions)
+
+            self._discounted_prices = array("d")
+            self._discounted_prices.frombytes(shared.buf[column_bytes:])
+        finally:
+            shared.close()
+            shared.unlink()
+
+        self._rebuild_price_indexes()
+
+    def _price_entries(self) -> Iterator[Tuple[str, float, int]]:
+        for product_id, row in self._rows.items():
+            yield self._details[row]["category"], self._row_price(row), product_id
+
+    def _row_price(self, row: int) -> float:
+        discounted_price = self._discounted_prices[row]
+        if math.isnan(discounted_price):
+            return self._prices[row]
+        return discounted_price
+
+    def _materialize(self, row: int) -> Product:
+        discounted_price = self._discounted_prices[row]
+        if math.isnan(discounted_price):
+            discounted_price = None
+
+        return {
+            **self._details[row],
+            "price": self._prices[row],
+            "stock": self._stocks[row],
+            "discounted_price": discounted_price,
+        }
+
+    def _store(self, product: Product) -> None:
+        details = {
+            field: product[field]
+            for field in ("id", "name", "category", "supplier", "warranty")
+        }
+        discounted_price = product.get("discounted_price")
+        if discounted_price is None:
+            discounted_price = self.NO_DISCOUNT
+
+        row = self._rows.get(product["id"])
+        if row is None:
+            self._rows[product["id"]] = len(self._details)
+            self._details.append(details)
+            self._prices.append(product["price"])
+            self._stocks.append(product["stock"])
+            self._discounted_prices.append(discounted_price)
+            return
+
+        self._details[row] = details
+        self._prices[row] = product["price"]
+        self._stocks[row] = product["stock"]
+        self._discounted_prices[row] = discounted_price
+
+    def _set_field(self, product_id: int, field: str, value: Any) -> None:
+        row = self._rows[product_id]
+        columns = {
+            "price": self._prices,
+            "stock": self._stocks,
+            "discounted_price": self._discounted_prices,
+        }
+
+        if field in columns:
+            columns[field][row] = self.NO_DISCOUNT if value is None else value
+        else:
+            self._details[row][field] = value
+
+
+def _reprice_partition(
+    shared_name: str, column_bytes: int, start: int, stop: int, discount_rate: float
+) -> None:
+    shared = SharedMemory(name=shared_name)
+    try:
+        prices = shared.buf[:column_bytes].cast("d")
+        discounted_prices = shared.buf[column_bytes : 2 * column_bytes].cast("d")
+
+        for row in range(start, stop):
+            discounted_prices[row] = discount_rate * prices[row]
+
+        prices.release()
+        discounted_prices.release()
+    finally:
+        shared.close()
+
+
+# ✅ Catálogo mapeado en memoria: registros binarios de ancho fijo + tabla de strings
+# ✅ Abrir el fichero no crea objetos Python; cada producto se lee al pedirlo
+# ✅ El mapeo es copia privada: ningún cambio toca el disco hasta llamar a save(),
+# ✅ que reescribe el catálogo completo de una vez
+class MappedProductCatalog(ProductCatalog):
+    MAGIC = b"PCAT"
+    HEADER = struct.Struct("<4sQQ")
+    RECORD = struct.Struct("<qddq8I")
+    STRING_FIELDS = ("name", "category", "supplier", "warranty")
+    NUMERIC_FIELDS = {
+        "price": (8, "<d"),
+        "discounted_price": (16, "<d"),
+        "stock": (24, "<q"),
+    }
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_COPY)
+        magic, self._count, self._strings_offset = self.HEADER.unpack_from(self._map)
+        if magic != self.MAGIC:
+            self.close()
+            raise ValueError(f"Fichero de catálogo inválido: {path}")
+
+        # ✅ Altas y cambios de texto viven en memoria hasta save()
+        self._overlay: Dict[int, Product] = {}
+
+        # ✅ Los índices secundarios se construyen solo si alguien los consulta
+        super().__init__(lazy_indexes=True)
+
+    @classmethod
+    def write(cls, path: str, products: Iterable[Product]) -> None:
+        strings = bytearray()
+        records = []
+
+        for product in sorted(products, key=lambda p: p["id"]):
+            offsets = []
+            for field in cls.STRING_FIELDS:
+                encoded = product[field].encode("utf-8")
+                offsets += [len(strings), len(encoded)]
+                strings += encoded
+
+            discounted_price = product.get("discounted_price")
+            records.append(
+                cls.RECORD.pack(
+                    product["id"],
+                    product["price"],
+                    math.nan if discounted_price is None else discounted_price,
+                    product["stock"],
+                    *offsets,
+                )
+            )
+
+        strings_offset = cls.HEADER.size + cls.RECORD.size * len(records)
+        # ✅ Fichero temporal + os.replace: quien mapeó el anterior sigue leyéndolo
+        with open(path + ".tmp", "wb") as file:
+            file.write(cls.HEADER.pack(cls.MAGIC, len(records), strings_offset))
+            file.writelines(records)
+            file.write(strings)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(path + ".tmp", path)
+
+    def save(self, path: Optional[str] = None) -> None:
+        self.write(path or self.path, self)
+
+    def close(self) -> None:
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self) -> "MappedProductCatalog":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        shadowed = sum(1 for product_id in self._overlay if self._row(product_id) >= 0)
+
+        return self._count + len(self._overlay) - shadowed
+
+    def __iter__(self) -> Iterator[Product]:
+        for row in range(self._count):
+            product_id = self._id_at(row)
+            if product_id not in self._overlay:
+                yield self._materialize(row)
+
+        yield from list(self._overlay.values())
+
+    def __contains__(self, product_id: object) -> bool:
+        return product_id in self._overlay or self._row(product_id) >= 0
+
+    def get(self, product_id: int) -> Optional[Product]:
+        if product_id in self._overlay:
+            return self._overlay[product_id]
+
+        row = self._row(product_id)
+        if row < 0:
+            return None
+
+        return self._materialize(row)
+
+    # ✅ Búsqueda binaria directamente sobre el mmap (registros ordenados por id)
+    def _row(self, product_id: object) -> int:
+        row = bisect_left(range(self._count), product_id, key=self._id_at)
+        if row < self._count and self._id_at(row) == product_id:
+            return row
+
+        return -1
+
+    def _id_at(self, row: int) -> int:
+        return struct.unpack_from("<q", self._map, self._offset(row))[0]
+
+    def _offset(self, row: int) -> int:
+        return self.HEADER.size + row * self.RECORD.size
+
+    def _materialize(self, row: int) -> Product:
+        record = self.RECORD.unpack_from(self._map, self._offset(row))
+        product_id, price, discounted_price, stock, *offsets = record
+        if math.isnan(discounted_price):
+            discounted_price = None
+
+        strings = {
+            field: self._string(offsets[2 * i], offsets[2 * i + 1])
+            for i, field in enumerate(self.STRING_FIELDS)
+        }
+
+        return {
+            "id": product_id,
+            "name": strings["name"],
+            "price": price,
+            "category": strings["category"],
+            "stock": stock,
+            "supplier": strings["supplier"],
+            "warranty": strings["warranty"],
+            "discounted_price": discounted_price,
+        }
+
+    def _string(self, offset: int, length: int) -> str:
+        start = self._strings_offset + offset
+        return self._map[start : start + length].decode("utf-8")
+
+    def _store(self, product: Product) -> None:
+        self._overlay[product["id"]] = product
+
+    # ✅ Los campos numéricos se escriben en su registro del mapeo (copia privada)
+    def _set_field(self, product_id: int, field: str, value: Any) -> None:
+        if product_id in self._overlay:
+            self._overlay[product_id][field] = value
+            return
+
+        if field not in self.NUMERIC_FIELDS:
+            self._overlay[product_id] = self.get(product_id)
+            self._overlay[product_id][field] = value
+            return
+
+        field_offset, field_format = self.NUMERIC_FIELDS[field]
+        offset = self._offset(self._row(product_id)) + field_offset
+        struct.pack_into(
+            field_format, self._map, offset, math.nan if value is None else value
+        )
+
+
+# ✅ Versión inmutable del catálogo: los lectores la fijan y nunca ven estados a medias
+class CatalogSnapshot:
+    CHUNK_SIZE = 1_024
+
+    def __init__(self, version: int, chunks: Dict[int, Dict[int, Product]], count: int):
+        self.version = version
+        self._chunks = chunks
+        self._count = count
+
+    @classmethod
+    def from_products(cls, products: Iterable[Product]) -> "CatalogSnapshot":
+        chunks: Dict[int, Dict[int, Product]] = defaultdict(dict)
+        for product in products:
+            chunks[cls.chunk_of(product["id"])][product["id"]] = product
+
+        return cls(0, dict(chunks), sum(len(chunk) for chunk in chunks.values()))
+
+    @classmethod
+    def chunk_of(cls, product_id: int) -> int:
+        return product_id // cls.CHUNK_SIZE
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __iter__(self) -> Iterator[Mapping[str, Any]]:
+        for chunk in self._chunks.values():
+            for product in chunk.values():
+                yield MappingProxyType(product)
+
+    def __contains__(self, product_id: object) -> bool:
+        return self._raw(product_id) is not None
+
+    def get(self, product_id: int) -> Optional[Mapping[str, Any]]:
+        product = self._raw(product_id)
+        if product is None:
+            return None
+        return MappingProxyType(product)
+
+    def _raw(self, product_id: Any) -> Optional[Product]:
+        chunk = self._chunks.get(self.chunk_of(product_id))
+        if chunk is None:
+            return None
+        return chunk.get(product_id)
+
+    # ✅ Copia en escritura por bloques: solo se copian los bloques modificados
+    def with_changes(self, products: Iterable[Product]) -> "CatalogSnapshot":
+        chunks = dict(self._chunks)
+        copied: Dict[int, Dict[int, Product]] = {}
+        count = self._count
+
+        for product in products:
+            chunk_id = self.chunk_of(product["id"])
+            if chunk_id not in copied:
+                copied[chunk_id] = dict(chunks.get(chunk_id, {}))
+                chunks[chunk_id] = copied[chunk_id]
+
+            if product["id"] not in copied[chunk_id]:
+                count += 1
+            copied[chunk_id][product["id"]] = product
+
+        return CatalogSnapshot(self.version + 1, chunks, count)
+
+
+# ✅ Catálogo versionado (MVCC): los escritores publican versiones, los lectores
+# ✅ no se bloquean
+# ✅ Las versiones viejas se liberan solas cuando nadie las referencia
+# ✅ Los escritores se serializan con un lock: publicar la versión y mantener los
+# ✅ índices compartidos (precio, nombre) es una sola operación
+# ✅ Las consultas por índice copian los ids bajo ese lock (un instante, sin esperar a
+# ✅ lotes) y los resuelven contra la versión publicada en ese mismo momento
+class VersionedProductCatalog(ProductCatalog):
+    def __init__(self, products: Iterable[Product] = ()):
+        self._write_lock = threading.RLock()
+        self._current = CatalogSnapshot.from_products([])
+        self._live_versions: "weakref.WeakSet[CatalogSnapshot]" = weakref.WeakSet()
+
+        super().__init__(products)
+
+    def __len__(self) -> int:
+        return len(self._current)
+
+    def __iter__(self) -> Iterator[Product]:
+        return iter(self._current)
+
+    def __contains__(self, product_id: object) -> bool:
+        return product_id in self._current
+
+    def get(self, product_id: int) -> Optional[Product]:
+        return self._current.get(product_id)
+
+    def snapshot(self) -> CatalogSnapshot:
+        return self._current
+
+    def live_versions(self) -> int:
+        return len(self._live_versions)
+
+    def find_by_category(self, category: str) -> Iterator[Product]:
+        with self._write_lock:
+            return super().find_by_category(category)
+
+    def find_by_supplier(self, supplier: str) -> Iterator[Product]:
+        with self._write_lock:
+            return super().find_by_supplier(supplier)
+
+    def find_by_price_range(
+        self, low: float, high: float, category: Optional[str] = None
+    ) -> Iterator[Product]:
+        with self._write_lock:
+            return super().find_by_price_range(low, high, category)
+
+    def find_cheapest(
+        self, limit: int, category: Optional[str] = None
+    ) -> Iterator[Product]:
+        with self._write_lock:
+            return super().find_cheapest(limit, category)
+
+    def find_by_name(self, query: str) -> Iterator[Product]:
+        with self._write_lock:
+            return super().find_by_name(query)
+
+    def search_by_name(self, query: str, limit: int = 10) -> Iterator[Product]:
+        with self._write_lock:
+            return super().search_by_name(query, limit)
+
+    # ✅ Se llama con el lock tomado: ids y versión salen del mismo instante
+    def _resolve(self, product_ids: Iterable[int]) -> Iterator[Product]:
+        version = self._current
+        return (version.get(product_id) for product_id in list(product_ids))
+
+    def add(self, product: Product) -> None:
+        with self._write_lock:
+            super().add(product)
+
+    def update_stock(self, product_id: int, delta: int) -> Product:
+        with self._write_lock:
+            return super().update_stock(product_id, delta)
+
+    def update_price(self, product_id: int, price: float) -> Product:
+        with self._write_lock:
+            return super().update_price(product_id, price)
+
+    def rename(self, product_id: int, name: str) -> Product:
+        with self._write_lock:
+            return super().rename(product_id, name)
+
+    # ✅ Un lote completo se publica como una única versión
+    def bulk_update(
+        self,
+        product_ids: Sequence[int],
+        discount_rate: float,
+        quantities: Optional[Sequence[int]] = None,
+    ) -> None:
+        self._check_quantities(product_ids, quantities)
+        with self._write_lock:
+            previous = [self._require(product_id) for product_id in product_ids]
+            updated = {
+                product["id"]: {
+                    **product,
+                    "discounted_price": product["price"] * discount_rate,
+                }
+                for product in previous
+            }
+            for product_id, quantity in zip(product_ids, quantities or ()):
+                updated[product_id]["stock"] -= quantity
+
+            self._publish(updated.values())
+
+            for product in previous:
+                self._unindex_price(product)
+            for product in updated.values():
+                self._index_price(product)
+
+    def _store(self, product: Product) -> None:
+        with self._write_lock:
+            self._publish([dict(product)])
+
+    def _set_field(self, product_id: int, field: str, value: Any) -> None:
+        with self._write_lock:
+            self._publish([{**self._require(product_id), field: value}])
+
+    def _publish(self, products: Iterable[Product]) -> None:
+        self._current = self._current.with_changes(products)
+        self._live_versions.add(self._current)
+
+
+# ✅ Una línea de ajuste: (id de producto, cantidad a descontar, tasa de descuento)
+StockAdjustment = Tuple[int, int, float]
+
+
+@dataclass(frozen=True)
+class StockAdjustmentSummary:
+    lines: int
+    products: int
+    total_quantity: int
+    discounted_prices: Dict[int, float]
+
+
+# ✅ Vigilancia de stock bajo: umbrales ordenados por producto y por categoría
+# ✅ Cada cambio de stock busca con bisect solo los umbrales cruzados
+@dataclass(frozen=True)
+class LowStockAlert:
+    product_id: int
+    category: str
+    threshold: int
+    stock: int
+
+
+class LowStockWatcher:
     def __init__(self):
-        self.products: List[Product] = [
+        self._by_product: Dict[int, List[Tuple[int, int]]] = {}
+        self._by_category: Dict[str, List[Tuple[int, int]]] = {}
+        self._subscriptions: Dict[int, Tuple[Dict[Any, Any], Any, int]] = {}
+        self._callbacks: Dict[int, Callable[[LowStockAlert], None]] = {}
+        self._subscription_ids = itertools.count(1)
+
+    def __bool__(self) -> bool:
+        return bool(self._subscriptions)
+
+    def subscribe(
+        self,
+        threshold: int,
+        callback: Callable[[LowStockAlert], None],
+        product_id: Optional[int] = None,
+        category: Optional[str] = None,
+    ) -> int:
+        if (product_id is None) == (category is None):
+            raise ValueError("Indica un producto o una categoría, no ambos")
+
+        index, key = (
+            (self._by_product, product_id)
+            if product_id is not None
+            else (self._by_category, category)
+        )
+        subscription_id = next(self._subscription_ids)
+        insort(index.setdefault(key, []), (threshold, subscription_id))
+        self._subscriptions[subscription_id] = (index, key, threshold)
+        self._callbacks[subscription_id] = callback
+        return subscription_id
+
+    def unsubscribe(self, subscription_id: int) -> bool:
+        subscription = self._subscriptions.pop(subscription_id, None)
+        if subscription is None:
+            return False
+
+        index, key, threshold = subscription
+        index[key].remove((threshold, subscription_id))
+        if not index[key]:
+            del index[key]
+        del self._callbacks[subscription_id]
+        return True
+
+    # ✅ Un umbral se cruza cuando el stock pasa de >= umbral a < umbral
+    def check(
+        self, product_id: int, category: str, old_stock: int, new_stock: int
+    ) -> None:
+        if new_stock >= old_stock:
+            return
+
+        for thresholds in (
+            self._by_product.get(product_id, []),
+            self._by_category.get(category, []),
+        ):
+            start = bisect_right(thresholds, (new_stock, math.inf))
+            stop = bisect_right(thresholds, (old_stock, math.inf))
+            for threshold, subscription_id in thresholds[start:stop]:
+                alert = LowStockAlert(product_id, category, threshold, new_stock)
+                self._callbacks[subscription_id](alert)
+
+
+# ✅ Acumulador de deltas de stock: muchas escrituras a un SKU caliente se funden en una
+# ✅ Se vacía por tamaño o por antigüedad; las lecturas suman stock + delta pendiente
+class StockDeltaBuffer:
+    MAX_PENDING = 1_000
+    MAX_DELAY_SECONDS = 0.05
+
+    def __init__(
+        self,
+        apply_delta: Callable[[int, int], Any],
+        max_pending: int = MAX_PENDING,
+        max_delay_seconds: float = MAX_DELAY_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._apply_delta = apply_delta
+        self._max_pending = max_pending
+        self._max_delay_seconds = max_delay_seconds
+        self._clock = clock
+        self._lock = threading.RLock()
+        self._pending: Dict[int, int] = {}
+        self._pending_writes = 0
+        self._oldest_write: Optional[float] = None
+
+    # ✅ Mientras se sostiene no entra ni se vacía ningún delta
+    # ✅ Orden de locks: primero este, después la franja del producto (como flush)
+    @property
+    def lock(self) -> threading.RLock:
+        return self._lock
+
+    def add(self, product_id: int, delta: int) -> None:
+        with self._lock:
+            self._pending[product_id] = self._pending.get(product_id, 0) + delta
+            self._pending_writes += 1
+            if self._oldest_write is None:
+                self._oldest_write = self._clock()
+
+            self._flush_if_due()
+
+    # ✅ Stock efectivo antes y después del cambio, calculados bajo el mismo lock
+    def add_and_read(
+        self, product_id: int, delta: int, read_flushed: Callable[[int], int]
+    ) -> Tuple[int, int]:
+        with self._lock:
+            old_stock = self.read(product_id, read_flushed)
+            self.add(product_id, delta)
+            return old_stock, old_stock + delta
+
+    def read(self, product_id: int, read_flushed: Callable[[int], int]) -> int:
+        with self._lock:
+            self._flush_if_due()
+            return read_flushed(product_id) + self._pending.get(product_id, 0)
+
+    def flush(self, product_id: Optional[int] = None) -> int:
+        with self._lock:
+            if product_id is None:
+                product_ids = list(self._pending)
+            else:
+                product_ids = [product_id] if product_id in self._pending else []
+
+            for pending_id in product_ids:
+                self._apply_delta(pending_id, self._pending.pop(pending_id))
+
+            if not self._pending:
+                self._pending_writes = 0
+                self._oldest_write = None
+
+            return len(product_ids)
+
+    def _flush_if_due(self) -> None:
+        if self._oldest_write is None:
+            return
+
+        too_many = self._pending_writes >= self._max_pending
+        too_old = self._clock() - self._oldest_write >= self._max_delay_seconds
+        if too_many or too_old:
+            self.flush()
+
+
+class ProductService:
+    LOCK_STRIPES = 64
+
+    def __init__(
+        self,
+        catalog: Optional[ProductCatalog] = None,
+        lock_stripes: int = LOCK_STRIPES,
+    ):
+        if catalog is None:
+            catalog = ProductCatalog(self._default_products())
+
+        self._catalog = catalog
+
+        # ✅ Un lock por franja de productos: SKUs distintos no compiten entre sí
+        self._stock_locks = [threading.Lock() for _ in range(lock_stripes)]
+        self._reservation_ids = itertools.count(1)
+        self._reservations: Dict[int, Tuple[int, int]] = {}
+        self._low_stock_watcher = LowStockWatcher()
+        self._stock_deltas = StockDeltaBuffer(self._apply_stock_delta)
+
+    @staticmethod
+    def _default_products() -> List[Product]:
+        return [
             {
                 "id": 1,
                 "name": "Laptop",
@@ -45,67 +1190,1418 @@ class ProductService:
             },
         ]
 
-    # ✅ Líneas cortas, una acción por línea
-    def find_product_by_id_and_update_stock_and_calculate_discount_and_send_notification(
-        self, product_id: int, quantity: int, discount_rate: float
-    ) -> Optional[Product]:
-        product = self._find_product_by_id(product_id)
+    @property
+    def products(self) -> List[Product]:
+        self._stock_deltas.flush()
+        return list(self._catalog)
+
+    # ✅ Consultas por índices secundarios, sin recorrer todo el catálogo
+    # ✅ Toda lectura publica antes los deltas pendientes: stock efectivo, no atrasado
+    def add_product(self, product: Product) -> None:
+        self._catalog.add(product)
+
+    def find_products_by_category(self, category: str) -> List[Product]:
+        self._stock_deltas.flush()
+        return list(self._catalog.find_by_category(category))
+
+    def find_products_by_supplier(self, supplier: str) -> List[Product]:
+        self._stock_deltas.flush()
+        return list(self._catalog.find_by_supplier(supplier))
+
+    # ✅ Consultas por precio: iteradores perezosos sobre el índice ordenado
+    def find_products_in_price_range(
+        self, low: float, high: float, category: Optional[str] = None
+    ) -> Iterator[Product]:
+        self._stock_deltas.flush()
+        return self._catalog.find_by_price_range(low, high, category)
+
+    def find_cheapest_products(
+        self, limit: int, category: Optional[str] = None
+    ) -> Iterator[Product]:
+        self._stock_deltas.flush()
+        return self._catalog.find_cheapest(limit, category)
+
+    def update_price(self, product_id: int, price: float) -> Optional[Product]:
+        if product_id not in self._catalog:
+            return None
+
+        return self._catalog.update_price(product_id, price)
+
+    # ✅ Búsqueda por nombre con el índice de trigramas
+    def find_products_by_name(self, query: str) -> List[Product]:
+        self._stock_deltas.flush()
+        return list(self._catalog.find_by_name(query))
+
+    def search_products_by_name(self, query: str, limit: int = 10) -> List[Product]:
+        self._stock_deltas.flush()
+        return list(self._catalog.search_by_name(query, limit))
+
+    def rename_product(self, product_id: int, name: str) -> Optional[Product]:
+        if product_id not in self._catalog:
+            return None
+
+        return self._catalog.rename(product_id, name)
+
+    # ✅ Reprecio nocturno: una llamada para muchos productos
+    def apply_bulk_discount(
+        self,
+        product_ids: Sequence[int],
+        discount_rate: float,
+        quantities: Optional[Sequence[int]] = None,
+    ) -> None:
+        if not quantities or not self._low_stock_watcher:
+            self._catalog.bulk_update(product_ids, discount_rate, quantities)
+            return
+
+        previous = {
+            product_id: self._catalog.get(product_id) for product_id in product_ids
+        }
+        old_stocks = {
+            product_id: product["stock"]
+            for product_id, product in previous.items()
+            if product is not None
+        }
+        self._catalog.bulk_update(product_ids, discount_rate, quantities)
+
+        for product_id, old_stock in old_stocks.items():
+            product = self._catalog.get(product_id)
+            self._low_stock_watcher.check(
+                product_id, product["category"], old_stock, product["stock"]
+            )
+
+    # ✅ Lecturas consistentes: la foto fija incluye los deltas pendientes
+    def snapshot(self) -> CatalogSnapshot:
+        self._stock_deltas.flush()
+        return self._catalog.snapshot()
+
+    # ✅ Reprecio de todo el catálogo; con el catálogo columnar admite varios procesos
+    def reprice_catalog(self, discount_rate: float, workers: int = 1) -> None:
+        self._catalog.reprice_all(discount_rate, workers)
+
+    # ✅ Alertas de stock bajo: solo se disparan al cruzar el umbral
+    def watch_low_stock(
+        self,
+        threshold: int,
+        callback: Callable[[LowStockAlert], None],
+        product_id: Optional[int] = None,
+        category: Optional[str] = None,
+    ) -> int:
+        return self._low_stock_watcher.subscribe(
+            threshold, callback, product_id, category
+        )
+
+    def unwatch_low_stock(self, subscription_id: int) -> bool:
+        return self._low_stock_watcher.unsubscribe(subscription_id)
+
+    # ✅ Líneas cortas, una acción por línea
+    def find_product_by_id_and_update_stock_and_calculate_discount_and_send_notification(
+        self,
+        product_id: int,
+        quantity: int,
+        discount_rate: float,
+        copy_result: bool = True,
+    ) -> Optional[Mapping]:
+        updated = self._update_stock_with_discount(product_id, quantity, discount_rate)
+
+        if not updated:
+            return None
+
+        product, discounted_price = updated
+
+        # ✅ Sin copia: una vista de solo lectura sobre el producto actualizado
+        if not copy_result:
+            return ProductView(product, discounted_price)
+
+        result = product.copy()
+        result["discounted_price"] = discounted_price
+        return result
+
+    # ✅ Sin materializar nada: solo el precio con descuento
+    def update_stock_and_get_discounted_price(
+        self, product_id: int, quantity: int, discount_rate: float
+    ) -> Optional[float]:
+        updated = self._update_stock_with_discount(product_id, quantity, discount_rate)
+
+        if not updated:
+            return None
+
+        return updated[1]
+
+    def _update_stock_with_discount(
+        self, product_id: int, quantity: int, discount_rate: float
+    ) -> Optional[Tuple[Product, float]]:
+        product = self._find_product_by_id(product_id)
+
+        if not product:
+            return None
+
+        self._stock_deltas.flush(product_id)
+        product = self._change_stock(product_id, -quantity)
+        discounted_price = self._calculate_discounted_price(
+            product["price"], discount_rate
+        )
+
+        self._notify(
+            f"Producto {product['name']} actualizado. "
+            f"Stock: {product['stock']}, "
+            f"Precio con descuento: {discounted_price}"
+        )
+
+        return product, discounted_price
+
+    # ✅ Lote de ajustes: validar todo, aplicar en una pasada, notificar una vez
+    def apply_stock_adjustments(
+        self, adjustments: Iterable[StockAdjustment]
+    ) -> StockAdjustmentSummary:
+        lines = list(adjustments)
+        self._validate_adjustments(lines)
+
+        quantities: Dict[int, int] = defaultdict(int)
+        discounted_prices: Dict[int, float] = {}
+        for product_id, quantity, discount_rate in lines:
+            quantities[product_id] += quantity
+            price = self._catalog.get(product_id)["price"]
+            discounted_prices[product_id] = self._calculate_discounted_price(
+                price, discount_rate
+            )
+
+        for product_id, quantity in quantities.items():
+            self._change_stock(product_id, -quantity)
+
+        summary = StockAdjustmentSummary(
+            lines=len(lines),
+            products=len(quantities),
+            total_quantity=sum(quantities.values()),
+            discounted_prices=discounted_prices,
+        )
+        self._notify(
+            f"Ajuste de stock aplicado: {summary.lines} líneas, "
+            f"{summary.products} productos, "
+            f"{summary.total_quantity} unidades"
+        )
+        return summary
+
+    def _validate_adjustments(self, lines: List[StockAdjustment]) -> None:
+        invalid_lines = [
+            line_number
+            for line_number, (product_id, quantity, discount_rate) in enumerate(lines)
+            if product_id not in self._catalog
+            or not isinstance(quantity, int)
+            or discount_rate <= 0
+        ]
+
+        if invalid_lines:
+            raise ValueError(f"Líneas de ajuste inválidas: {invalid_lines}")
+
+    def _notify(self, message: str) -> None:
+        print(message)
+
+    # ✅ Escrituras acumuladas para SKUs calientes (ventas flash)
+    def buffer_stock_change(self, product_id: int, delta: int) -> None:
+        if product_id not in self._catalog:
+            raise KeyError(f"Producto desconocido: {product_id}")
+
+        old_stock, new_stock = self._stock_deltas.add_and_read(
+            product_id, delta, lambda pid: self._catalog.get(pid)["stock"]
+        )
+        # ✅ La alerta salta al acumular el cambio, no cuando se vacíe el buffer
+        self._low_stock_watcher.check(
+            product_id, self._catalog.get(product_id)["category"], old_stock, new_stock
+        )
+
+    def flush_stock_changes(self) -> int:
+        return self._stock_deltas.flush()
+
+    def get_stock(self, product_id: int) -> Optional[int]:
+        if product_id not in self._catalog:
+            return None
+
+        return self._stock_deltas.read(
+            product_id, lambda pid: self._catalog.get(pid)["stock"]
+        )
+
+    # ✅ Reservas concurrentes: reservar, confirmar o liberar stock
+    def reserve(self, product_id: int, quantity: int) -> Optional[int]:
+        if quantity <= 0:
+            raise ValueError(f"Cantidad a reservar inválida: {quantity}")
+
+        # ✅ Con el lock del buffer tomado el stock publicado es el efectivo: ningún
+        # ✅ delta puede colarse entre el vaciado y la comprobación
+        with self._stock_deltas.lock:
+            self._stock_deltas.flush(product_id)
+
+            with self._lock_for(product_id):
+                product = self._find_product_by_id(product_id)
+                if not product or product["stock"] < quantity:
+                    return None
+
+                old_stock = product["stock"]
+                product = self._catalog.update_stock(product_id, -quantity)
+                new_stock = product["stock"]
+
+        self._low_stock_watcher.check(
+            product_id, product["category"], old_stock, new_stock
+        )
+        reservation_id = next(self._reservation_ids)
+        self._reservations[reservation_id] = (product_id, quantity)
+        return reservation_id
+
+    def commit(self, reservation_id: int) -> bool:
+        return self._reservations.pop(reservation_id, None) is not None
+
+    def release(self, reservation_id: int) -> bool:
+        reservation = self._reservations.pop(reservation_id, None)
+        if reservation is None:
+            return False
+
+        product_id, quantity = reservation
+        self._change_stock(product_id, quantity)
+        return True
+
+    def _find_product_by_id(self, product_id: int) -> Optional[Product]:
+        return self._catalog.get(product_id)
+
+    def _change_stock(self, product_id: int, delta: int) -> Product:
+        with self._lock_for(product_id):
+            old_stock = self._catalog.get(product_id)["stock"]
+            product = self._catalog.update_stock(product_id, delta)
+            new_stock = product["stock"]
+
+        # ✅ Las alertas se disparan fuera del lock para no bloquear otros hilos
+        self._low_stock_watcher.check(
+            product_id, product["category"], old_stock, new_stock
+        )
+        return product
+
+    # ✅ Al vaciar el buffer no se repiten alertas: ya saltaron al acumular
+    def _apply_stock_delta(self, product_id: int, delta: int) -> Product:
+        with self._lock_for(product_id):
+            return self._catalog.update_stock(product_id, delta)
+
+    def _lock_for(self, product_id: int) -> threading.Lock:
+        return self._stock_locks[hash(product_id) % len(self._stock_locks)]
+
+    def _calculate_discounted_price(self, price: float, discount_rate: float) -> float:
+        return price * discount_rate
+
+
+# ✅ Importación en streaming: la memoria depende del tamaño del bloque, no del fichero
+@dataclass
+class ImportProgress:
+    rows_read: int = 0
+    rows_imported: int = 0
+    rows_rejected: int = 0
+    chunks: int = 0
+    elapsed_seconds: float = 0.0
+    errors: List[str] = field(default_factory=list)
+
+    @property
+    def rows_per_second(self) -> float:
+        if self.elapsed_seconds == 0:
+            return 0.0
+        return self.rows_read / self.elapsed_seconds
+
+
+class CatalogImporter:
+    CHUNK_SIZE = 1_000
+    MAX_ERRORS = 100
+
+    def __init__(self, service: ProductService, chunk_size: int = CHUNK_SIZE):
+        self._service = service
+        self._chunk_size = chunk_size
+        self._parsers = {
+            name: self._parser_for(annotation)
+            for name, annotation in get_type_hints(Product).items()
+        }
+        self.progress = ImportProgress()
+
+    def import_csv(self, path: str) -> ImportProgress:
+        with open(path, newline="", encoding="utf-8") as file:
+            return self._consume(csv.DictReader(file), from_text=True)
+
+    def import_jsonl(self, path: str) -> ImportProgress:
+        # ✅ Cada línea se decodifica en _parse: una línea rota es un rechazo más
+        with open(path, encoding="utf-8") as file:
+            return self._consume(line for line in file if line.strip())
+
+    # ✅ Generador: entrega el progreso tras cada bloque importado
+    # ✅ from_text indica filas de texto (CSV), donde los números llegan como strings
+    def iter_import(
+        self, rows: Iterable[Dict[str, Any]], from_text: bool = False
+    ) -> Iterator[ImportProgress]:
+        rows = iter(rows)
+        start = time.perf_counter() - self.progress.elapsed_seconds
+
+        while chunk := list(itertools.islice(rows, self._chunk_size)):
+            for product in self._validate_chunk(chunk, from_text):
+                self._service.add_product(product)
+                self.progress.rows_imported += 1
+
+            self.progress.chunks += 1
+            self.progress.elapsed_seconds = time.perf_counter() - start
+            yield self.progress
+
+    def _consume(
+        self, rows: Iterable[Dict[str, Any]], from_text: bool = False
+    ) -> ImportProgress:
+        for _ in self.iter_import(rows, from_text):
+            pass
+        return self.progress
+
+    def _validate_chunk(
+        self, chunk: List[Dict[str, Any]], from_text: bool
+    ) -> List[Product]:
+        products = []
+
+        for row in chunk:
+            self.progress.rows_read += 1
+            try:
+                products.append(self._parse(row, from_text))
+            except (json.JSONDecodeError, KeyError, TypeError, ValueError) as error:
+                self.progress.rows_rejected += 1
+                if len(self.progress.errors) < self.MAX_ERRORS:
+                    self.progress.errors.append(
+                        f"Fila {self.progress.rows_read}: {error!r}"
+                    )
+
+        return products
+
+    def _parse(
+        self, row: Union[str, Dict[str, Any]], from_text: bool = False
+    ) -> Product:
+        if isinstance(row, str):
+            row = json.loads(row)
+        if not isinstance(row, dict):
+            raise TypeError(f"Se esperaba un objeto: {row!r}")
+
+        return {
+            name: parse(row.get(name), from_text)
+            for name, parse in self._parsers.items()
+        }
+
+    # ✅ Valida en lugar de convertir a ciegas: True no es un id ni 3.7 un stock
+    @staticmethod
+    def _parser_for(annotation: Any) -> Callable[[Any, bool], Any]:
+        optional = annotation == Optional[float]
+        expected = float if optional else annotation
+
+        def parse(value: Any, from_text: bool) -> Any:
+            if value is None or value == "":
+                if optional:
+                    return None
+                raise ValueError("Campo obligatorio vacío")
+
+            if expected is str:
+                if not isinstance(value, str):
+                    raise TypeError(f"Se esperaba texto: {value!r}")
+                return value
+
+            if isinstance(value, str) and from_text:
+                return expected(value)
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                raise TypeError(f"Se esperaba un número: {value!r}")
+            if expected is int and not float(value).is_integer():
+                raise ValueError(f"Se esperaba un entero: {value!r}")
+            return expected(value)
+
+        return parse
+
+
+# ✅ Espaciado vertical apropiado
+# ✅ Líneas en blanco separan conceptos relacionados
+# ✅ Métodos relacionados están cerca
+
+
+class OrderItem(TypedDict):
+    price: float
+    quantity: int
+
+
+class Order(TypedDict):
+    id: int
+    customer_id: int
+    items: List[OrderItem]
+    total: float
+    date: datetime
+    status: str
+
+
+# ✅ Orden compacta: atributos en __slots__ e ítems en dos columnas (precio, cantidad)
+# ✅ Se lee como un Order; "items" se materializa solo cuando alguien lo pide
+class OrderRecord(Mapping):
+    __slots__ = ("id", "customer_id", "total", "date", "status", "prices", "quantities")
+    FIELDS = ("id", "customer_id", "items", "total", "date", "status")
+
+    def __init__(
+        self,
+        id: int,
+        customer_id: int,
+        items: Iterable[OrderItem],
+        total: float,
+        date: datetime,
+        status: str = "pending",
+    ):
+        self.id = id
+        self.customer_id = customer_id
+        self.total = total
+        self.date = date
+        self.status = status
+        items = list(items)
+        self.prices = array("d", [item["price"] for item in items])
+        self.quantities = array("q", [item["quantity"] for item in items])
+
+    @classmethod
+    def from_order(cls, order: Mapping) -> "OrderRecord":
+        return cls(**{key: order[key] for key in cls.FIELDS})
+
+    def __getitem__(self, key: str) -> Any:
+        if key == "items":
+            return [
+                {"price": price, "quantity": quantity}
+                for price, quantity in zip(self.prices, self.quantities)
+            ]
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.FIELDS)
+
+    def __len__(self) -> int:
+        return len(self.FIELDS)
+
+    def __repr__(self) -> str:
+        return f"OrderRecord({dict(self)!r})"
+
+
+# ✅ Lote plano de ítems: columnas de precio y cantidad + desplazamientos por orden
+# ✅ Los ítems de la orden i están en [offsets[i], offsets[i + 1])
+@dataclass
+class OrderItemBatch:
+    prices: array
+    quantities: array
+    offsets: array
+
+    @classmethod
+    def from_orders(cls, orders_items: Iterable[List[OrderItem]]) -> "OrderItemBatch":
+        batch = cls(array("d"), array("q"), array("q", [0]))
+        for items in orders_items:
+            batch.prices.extend(item["price"] for item in items)
+            batch.quantities.extend(item["quantity"] for item in items)
+            batch.offsets.append(len(batch.prices))
+        return batch
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+
+# ✅ Abstracción del generador de ids: se puede cambiar sin tocar el procesador
+class OrderIdGenerator(ABC):
+    @abstractmethod
+    def next_id(self) -> int:
+        pass
+
+
+# ✅ Id de 64 bits: milisegundos (41) + secuencia (12) + trabajador (10)
+# ✅ Sin lock ni reloj por id: un contador atómico que avanza 1 ms cada 4096 ids
+# ✅ Único entre hilos (contador) y entre procesos (cada proceso con su worker_id)
+# ✅ El worker_id lo asigna quien lanza los procesos: derivarlo del pid colisiona
+class SnowflakeIdGenerator(OrderIdGenerator):
+    EPOCH_MS = 1_704_067_200_000  # 2024-01-01 UTC
+    WORKER_BITS = 10
+    SEQUENCE_BITS = 12
+    MAX_WORKER_ID = (1 << WORKER_BITS) - 1
+
+    def __init__(self, worker_id: int):
+        if not 0 <= worker_id <= self.MAX_WORKER_ID:
+            raise ValueError(f"worker_id fuera de rango: {worker_id}")
+
+        self.worker_id = worker_id
+        elapsed_ms = time.time_ns() // 1_000_000 - self.EPOCH_MS
+        first_id = elapsed_ms << (self.SEQUENCE_BITS + self.WORKER_BITS) | worker_id
+        self._ids = itertools.count(first_id, 1 << self.WORKER_BITS)
+
+    def next_id(self) -> int:
+        return next(self._ids)
+
+    @classmethod
+    def worker_of(cls, order_id: int) -> int:
+        return order_id & cls.MAX_WORKER_ID
+
+
+# ✅ Un único generador por proceso para los procesadores sin generador propio:
+# ✅ dos procesadores creados en el mismo milisegundo no repiten ids
+# ✅ Válido para un solo proceso; con varios, cada uno recibe su worker_id
+_default_id_generator = SnowflakeIdGenerator(worker_id=0)
+
+
+# ✅ Cursor perezoso sobre un rango de fechas: no lee nada hasta que se itera
+# ✅ y sirve las órdenes de página en página (los None son lápidas y se saltan)
+class OrderCursor:
+    DEFAULT_PAGE_SIZE = 100
+
+    def __init__(
+        self,
+        orders: Iterable[Optional[Order]],
+        status: Optional[str] = None,
+        page_size: int = DEFAULT_PAGE_SIZE,
+    ):
+        self.page_size = page_size
+        self._orders = (
+            order
+            for order in orders
+            if order is not None and (status is None or order["status"] == status)
+        )
+
+    def __iter__(self) -> Iterator[Order]:
+        return self
+
+    def __next__(self) -> Order:
+        return next(self._orders)
+
+    def next_page(self) -> List[Order]:
+        return list(itertools.islice(self._orders, self.page_size))
+
+
+# ✅ Almacén de órdenes indexado por id: búsqueda y cancelación en O(1)
+# ✅ Cancelar deja una lápida; la compactación se reparte entre escrituras
+class OrderStore:
+    COMPACT_MIN_TOMBSTONES = 1_024
+
+    def __init__(self):
+        self._orders: List[Optional[Order]] = []
+        self._positions: Dict[Any, int] = {}
+        self._shadowed: Dict[Any, List[int]] = {}
+        self._tombstones = 0
+        # ✅ Índice por fecha: timestamps ordenados y la posición de cada orden
+        self._timestamps = array("d")
+        self._by_date = array("q")
+
+    def __len__(self) -> int:
+        return len(self._orders) - self._tombstones
+
+    def __iter__(self) -> Iterator[Order]:
+        return (order for order in self._orders if order is not None)
+
+    def __contains__(self, order_id: object) -> bool:
+        return order_id in self._positions
+
+    def get(self, order_id: Any) -> Optional[Order]:
+        position = self._positions.get(order_id)
+        if position is None:
+            return None
+        return self._orders[position]
+
+    def add(self, order: Order) -> None:
+        self._remember_position(order["id"], len(self._orders))
+        self._index_date(order["date"].timestamp(), len(self._orders))
+        self._orders.append(order)
+
+    def cursor(
+        self,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        status: Optional[str] = None,
+        page_size: int = OrderCursor.DEFAULT_PAGE_SIZE,
+    ) -> OrderCursor:
+        return OrderCursor(self.between(since, until), status, page_size)
+
+    def between(
+        self, since: Optional[datetime] = None, until: Optional[datetime] = None
+    ) -> Iterator[Optional[Order]]:
+        start = 0 if since is None else bisect_left(self._timestamps, since.timestamp())
+        stop = (
+            len(self._timestamps)
+            if until is None
+            else bisect_left(self._timestamps, until.timestamp())
+        )
+
+        return map(self._orders.__getitem__, self._by_date[start:stop])
+
+    def remove(self, order_id: Any) -> List[Order]:
+        position = self._positions.pop(order_id, None)
+        if position is None:
+            return []
+
+        positions = self._shadowed.pop(order_id, []) + [position]
+        removed = [self._orders[position] for position in positions]
+        for position in positions:
+            self._orders[position] = None
+        self._tombstones += len(positions)
+
+        self._compact_if_needed()
+        return removed
+
+    def _compact_if_needed(self) -> None:
+        if self._tombstones < self.COMPACT_MIN_TOMBSTONES:
+            return
+        if self._tombstones * 2 < len(self._orders):
+            return
+
+        self._orders = [order for order in self._orders if order is not None]
+        self._positions = {}
+        self._shadowed = {}
+        self._tombstones = 0
+        for position, order in enumerate(self._orders):
+            self._remember_position(order["id"], position)
+
+        # ✅ Las lápidas siguen en el índice por fecha hasta aquí; se reconstruye entero
+        dated = sorted(
+            (order["date"].timestamp(), position)
+            for position, order in enumerate(self._orders)
+        )
+        self._timestamps = array("d", (timestamp for timestamp, _ in dated))
+        self._by_date = array("q", (position for _, position in dated))
+
+    # ✅ Las órdenes llegan casi siempre en orden: el caso normal es añadir al final
+    def _index_date(self, timestamp: float, position: int) -> None:
+        if not self._timestamps or timestamp >= self._timestamps[-1]:
+            self._timestamps.append(timestamp)
+            self._by_date.append(position)
+            return
+
+        index = bisect_right(self._timestamps, timestamp)
+        self._timestamps.insert(index, timestamp)
+        self._by_date.insert(index, position)
+
+    # ✅ Ids repetidos (dos órdenes en el mismo instante) se conservan todos
+    def _remember_position(self, order_id: Any, position: int) -> None:
+        previous = self._positions.get(order_id)
+        if previous is not None:
+            self._shadowed.setdefault(order_id, []).append(previous)
+        self._positions[order_id] = position
+
+
+# ✅ Log de escritura anticipada: una línea JSON por operación, un fsync por grupo
+# ✅ El snapshot acota el replay; cada registro lleva un número de secuencia (lsn)
+# ✅ para no aplicar dos veces lo que ya está en el snapshot
+# ✅ Un temporizador sincroniza el grupo incompleto a los T ms aunque no llegue
+# ✅ ninguna orden más: la latencia de durabilidad queda acotada
+class OrderWriteAheadLog:
+    GROUP_COMMIT_SIZE = 64
+    GROUP_COMMIT_INTERVAL_MS = 10.0
+    CHECKPOINT_EVERY = 10_000
+
+    def __init__(
+        self,
+        path: str,
+        group_commit_size: int = GROUP_COMMIT_SIZE,
+        group_commit_interval_ms: float = GROUP_COMMIT_INTERVAL_MS,
+        checkpoint_every: int = CHECKPOINT_EVERY,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.path = path
+        self.snapshot_path = path + ".snapshot"
+        self._group_commit_size = group_commit_size
+        self._group_commit_interval = group_commit_interval_ms / 1000
+        self._checkpoint_every = checkpoint_every
+        self._clock = clock
+        self._file = open(path, "ab")
+        self._next_lsn = 1
+        self._unsynced = 0
+        self._oldest_unsynced: Optional[float] = None
+        self._since_checkpoint = 0
+        # ✅ Protege el fichero: escriben el hilo del llamante y el del temporizador
+        self._lock = threading.RLock()
+        self._timer: Optional[threading.Timer] = None
+
+    @property
+    def checkpoint_due(self) -> bool:
+        return self._since_checkpoint >= self._checkpoint_every
+
+    def replay(self) -> Iterator[Tuple[str, Any]]:
+        snapshot_lsn = 0
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, "rb") as snapshot:
+                snapshot_lsn = json.loads(snapshot.readline())["lsn"]
+                for line in snapshot:
+                    yield "add", self._decode_order(json.loads(line))
+
+        self._next_lsn = snapshot_lsn + 1
+        valid_bytes = 0
+        with open(self.path, "rb") as log:
+            for line in log:
+                # ✅ Una última línea a medias (caída durante la escritura) se descarta
+                if not line.endswith(b"\n"):
+                    break
+                valid_bytes += len(line)
+
+                record = json.loads(line)
+                if record["lsn"] <= snapshot_lsn:
+                    continue
+                self._next_lsn = record["lsn"] + 1
+                self._since_checkpoint += 1
+                if record["op"] == "add":
+                    yield "add", self._decode_order(record["order"])
+                elif record["op"] == "archive":
+                    yield "archive", record["ids"]
+                else:
+                    yield "cancel", record["id"]
+
+        self._file.truncate(valid_bytes)
+
+    def append_order(self, order: Order) -> None:
+        self._append({"op": "add", "order": order})
+
+    def append_cancel(self, order_id: int) -> None:
+        self._append({"op": "cancel", "id": order_id})
+
+    # ✅ Intención de mover órdenes al nivel frío: se sincroniza antes de moverlas
+    def append_archive(self, order_ids: List[int]) -> None:
+        self._append({"op": "archive", "ids": order_ids})
+        self.sync()
+
+    def sync(self) -> None:
+        with self._lock:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._unsynced = 0
+            self._oldest_unsynced = None
+            self._cancel_timer()
+
+    def checkpoint(self, orders: Iterable[Order]) -> None:
+        with self._lock:
+            self.sync()
+
+            temporary = self.snapshot_path + ".tmp"
+            with open(temporary, "wb") as snapshot:
+                snapshot.write(self._encode({"lsn": self._next_lsn - 1}))
+                snapshot.writelines(self._encode(order) for order in orders)
+                snapshot.flush()
+                os.fsync(snapshot.fileno())
+            os.replace(temporary, self.snapshot_path)
+
+            self._file.truncate(0)
+            os.fsync(self._file.fileno())
+            self._since_checkpoint = 0
+
+    def close(self) -> None:
+        with self._lock:
+            if self._unsynced:
+                self.sync()
+            self._cancel_timer()
+            self._file.close()
+
+    def __enter__(self) -> "OrderWriteAheadLog":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def _append(self, record: Dict[str, Any]) -> None:
+        with self._lock:
+            record["lsn"] = self._next_lsn
+            self._next_lsn += 1
+            self._file.write(self._encode(record))
+            self._since_checkpoint += 1
+
+            self._unsynced += 1
+            if self._oldest_unsynced is None:
+                self._oldest_unsynced = self._clock()
+                self._start_timer(self._group_commit_interval)
+            self._sync_if_due()
+
+    def _sync_if_due(self) -> None:
+        group_full = self._unsynced >= self._group_commit_size
+        group_old = self._clock() - self._oldest_unsynced >= self._group_commit_interval
+        if group_full or group_old:
+            self.sync()
+
+    # ✅ Si el grupo aún no cumplió T ms según el reloj, se reprograma por lo que falta
+    def _sync_on_timer(self) -> None:
+        with self._lock:
+            # ✅ Un temporizador cancelado mientras esperaba el lock no hace nada
+            if threading.current_thread() is not self._timer:
+                return
+            self._timer = None
+            if self._file.closed or not self._unsynced:
+                return
+
+            age = self._clock() - self._oldest_unsynced
+            if age >= self._group_commit_interval:
+                self.sync()
+            else:
+                self._start_timer(self._group_commit_interval - age)
+
+    def _start_timer(self, delay: float) -> None:
+        self._timer = threading.Timer(delay, self._sync_on_timer)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _cancel_timer(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    @staticmethod
+    def _encode(record: Dict[str, Any]) -> bytes:
+        line = json.dumps(
+            record, default=OrderWriteAheadLog._to_json, separators=(",", ":")
+        )
+        return line.encode("utf-8") + b"\n"
+
+    @staticmethod
+    def _to_json(value: Any) -> Any:
+        if isinstance(value, datetime):
+            return value.isoformat()
+        return dict(value)
+
+    @staticmethod
+    def _decode_order(order: Dict[str, Any]) -> Order:
+        order["date"] = datetime.fromisoformat(order["date"])
+        return order
+
+
+@dataclass(frozen=True)
+class CustomerStats:
+    order_count: int
+    total_spent: float
+    last_order_date: Optional[datetime]
+
+
+@dataclass(frozen=True)
+class OrderSegment:
+    file: str
+    count: int
+    min_id: int
+    max_id: int
+    since: float
+    until: float
+    # ✅ Un bloque por cada BLOCK_SIZE órdenes: [offset, longitud, id mínimo, id máximo,
+    # ✅ fecha mínima, fecha máxima]; los bloques van ordenados por id
+    blocks: List[List[float]]
+
+
+# ✅ Nivel frío: segmentos inmutables de bloques comprimidos con zlib (JSON por línea)
+# ✅ En memoria solo queda el índice disperso (rango de ids y de fechas por bloque)
+# ✅ y una caché LRU pequeña de bloques ya descomprimidos: una búsqueda por id
+# ✅ descomprime como mucho un bloque
+# ✅ Cancelar una orden archivada no reescribe el segmento: se anota una lápida
+# ✅ El manifiesto guarda además los agregados por cliente (órdenes, gasto, última
+# ✅ fecha): abrir el archivo no recorre ningún segmento
+class ColdOrderArchive:
+    SEGMENT_SIZE = 100_000
+    BLOCK_SIZE = 64
+    CACHED_BLOCKS = 64
+    MANIFEST = "manifest.json"
+    TOMBSTONES = "cancelled.log"
+
+    def __init__(
+        self,
+        directory: str,
+        segment_size: int = SEGMENT_SIZE,
+        block_size: int = BLOCK_SIZE,
+        cached_blocks: int = CACHED_BLOCKS,
+    ):
+        self.directory = directory
+        self._segment_size = segment_size
+        self._block_size = block_size
+        self._cached_blocks = cached_blocks
+        self._cache: "OrderedDict[Tuple[str, int], Dict[int, Order]]" = OrderedDict()
+        os.makedirs(directory, exist_ok=True)
+
+        self._segments: List[OrderSegment] = []
+        # ✅ Por cliente: [órdenes, gasto total, timestamp de la última orden]
+        self._customers: Dict[int, List[float]] = {}
+        applied_tombstones = 0
+        manifest = os.path.join(directory, self.MANIFEST)
+        if os.path.exists(manifest):
+            with open(manifest, encoding="utf-8") as file:
+                entries = json.load(file)
+            self._segments = [OrderSegment(**entry) for entry in entries["segments"]]
+            self._customers = {
+                int(customer_id): aggregate
+                for customer_id, aggregate in entries["customers"].items()
+            }
+            applied_tombstones = entries["tombstones"]
+        self._block_max_ids = [
+            [block[3] for block in segment.blocks] for segment in self._segments
+        ]
+
+        self._cancelled: Set[int] = set()
+        tombstones = os.path.join(directory, self.TOMBSTONES)
+        if os.path.exists(tombstones):
+            with open(tombstones, encoding="utf-8") as file:
+                order_ids = [int(line) for line in file if line.strip()]
+            self._cancelled = set(order_ids)
+            # ✅ Las lápidas posteriores al último manifiesto se descuentan al abrir
+            for order_id in order_ids[applied_tombstones:]:
+                self._subtract_customer_order(self._find(order_id))
+
+    def __len__(self) -> int:
+        return sum(segment.count for segment in self._segments) - len(self._cancelled)
+
+    def __iter__(self) -> Iterator[Order]:
+        return self.between()
+
+    def __contains__(self, order_id: object) -> bool:
+        return self.get(order_id) is not None
+
+    # ✅ Idempotente: las órdenes que ya están archivadas se ignoran, así el replay
+    # ✅ del log puede repetir un archivado que se cortó a medias
+    def archive(self, orders: Sequence[Order]) -> None:
+        orders = [order for order in orders if self._find(order["id"]) is None]
+        if not orders:
+            return
+
+        for start in range(0, len(orders), self._segment_size):
+            segment = self._write_segment(orders[start : start + self._segment_size])
+            self._segments.append(segment)
+            self._block_max_ids.append([block[3] for block in segment.blocks])
+        for order in orders:
+            self._add_customer_order(order)
+        # ✅ El manifiesto es el punto de confirmación: segmentos y agregados a la vez
+        self._write_manifest()
+
+    def get(self, order_id: Any) -> Optional[Order]:
+        if order_id in self._cancelled:
+            return None
+        return self._find(order_id)
+
+    def customer_stats(self, customer_id: int) -> CustomerStats:
+        aggregate = self._customers.get(customer_id)
+        if aggregate is None:
+            return CustomerStats(0, 0.0, None)
+
+        count, total, last_timestamp = aggregate
+        return CustomerStats(count, total, datetime.fromtimestamp(last_timestamp))
+
+    # ✅ Recorre todos los bloques: solo para consultas explícitas del histórico
+    def customer_orders(self, customer_id: int) -> Iterator[Order]:
+        return (order for order in self if order["customer_id"] == customer_id)
+
+    def _find(self, order_id: Any) -> Optional[Order]:
+        for segment, max_ids in zip(self._segments, self._block_max_ids):
+            if not segment.min_id <= order_id <= segment.max_id:
+                continue
+            block = bisect_left(max_ids, order_id)
+            order = self._load(segment, block).get(order_id)
+            if order is not None:
+                return order
+        return None
+
+    def between(
+        self, since: Optional[datetime] = None, until: Optional[datetime] = None
+    ) -> Iterator[Order]:
+        low = -math.inf if since is None else since.timestamp()
+        high = math.inf if until is None else until.timestamp()
+
+        for segment in self._segments:
+            if segment.until < low or segment.since >= high:
+                continue
+            for block, (*_, block_since, block_until) in enumerate(segment.blocks):
+                if block_until < low or block_since >= high:
+                    continue
+                for order in self._load(segment, block).values():
+                    if order["id"] in self._cancelled:
+                        continue
+                    if low <= order["date"].timestamp() < high:
+                        yield order
+
+    def cancel(self, order_id: int) -> Optional[Order]:
+        order = self.get(order_id)
+        if order is None:
+            return None
+
+        tombstones = os.path.join(self.directory, self.TOMBSTONES)
+        with open(tombstones, "a", encoding="utf-8") as file:
+            file.write(f"{order_id}\n")
+            file.flush()
+            os.fsync(file.fileno())
+        self._cancelled.add(order_id)
+        self._subtract_customer_order(order)
+        return order
+
+    def _add_customer_order(self, order: Order) -> None:
+        timestamp = order["date"].timestamp()
+        aggregate = self._customers.setdefault(
+            order["customer_id"], [0, 0.0, timestamp]
+        )
+        aggregate[0] += 1
+        aggregate[1] += order["total"]
+        aggregate[2] = max(aggregate[2], timestamp)
+
+    def _subtract_customer_order(self, order: Optional[Order]) -> None:
+        if order is None:
+            return
+
+        customer_id = order["customer_id"]
+        aggregate = self._customers[customer_id]
+        aggregate[0] -= 1
+        aggregate[1] -= order["total"]
+        if not aggregate[0]:
+            del self._customers[customer_id]
+        elif order["date"].timestamp() >= aggregate[2]:
+            aggregate[2] = self._latest_timestamp(customer_id)
+
+    # ✅ Solo al cancelar la última orden archivada de un cliente; se saltan los
+    # ✅ bloques cuya fecha máxima no mejora lo ya encontrado
+    def _latest_timestamp(self, customer_id: int) -> float:
+        latest = -math.inf
+        for segment in reversed(self._segments):
+            for block in reversed(range(len(segment.blocks))):
+                if segment.blocks[block][5] <= latest:
+                    continue
+                for order in self._load(segment, block).values():
+                    if order["customer_id"] != customer_id:
+                        continue
+                    if order["id"] not in self._cancelled:
+                        latest = max(latest, order["date"].timestamp())
+        return latest
+
+    def _write_segment(self, orders: Sequence[Order]) -> OrderSegment:
+        orders = sorted(orders, key=lambda order: order["id"])
+        data = bytearray()
+        blocks = []
+        for start in range(0, len(orders), self._block_size):
+            chunk = orders[start : start + self._block_size]
+            timestamps = [order["date"].timestamp() for order in chunk]
+            payload = b"".join(OrderWriteAheadLog._encode(order) for order in chunk)
+            compressed = zlib.compress(payload)
+            blocks.append(
+                [
+                    len(data),
+                    len(compressed),
+                    chunk[0]["id"],
+                    chunk[-1]["id"],
+                    min(timestamps),
+                    max(timestamps),
+                ]
+            )
+            data += compressed
+
+        segment = OrderSegment(
+            f"segment-{len(self._segments):06d}.zlib",
+            len(orders),
+            orders[0]["id"],
+            orders[-1]["id"],
+            min(block[4] for block in blocks),
+            max(block[5] for block in blocks),
+            blocks,
+        )
+        self._write_atomically(segment.file, bytes(data))
+        return segment
+
+    def _write_manifest(self) -> None:
+        entries = {
+            "segments": [vars(segment) for segment in self._segments],
+            "customers": self._customers,
+            "tombstones": len(self._cancelled),
+        }
+        self._write_atomically(self.MANIFEST, json.dumps(entries).encode("utf-8"))
+
+    def _write_atomically(self, name: str, data: bytes) -> None:
+        path = os.path.join(self.directory, name)
+        with open(path + ".tmp", "wb") as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(path + ".tmp", path)
+
+    def _load(self, segment: OrderSegment, block: int) -> Dict[int, Order]:
+        key = (segment.file, block)
+        orders = self._cache.get(key)
+        if orders is not None:
+            self._cache.move_to_end(key)
+            return orders
+
+        offset, length = segment.blocks[block][:2]
+        with open(os.path.join(self.directory, segment.file), "rb") as file:
+            file.seek(offset)
+            lines = zlib.decompress(file.read(length)).splitlines()
+        orders = {}
+        for line in lines:
+            order = OrderWriteAheadLog._decode_order(json.loads(line))
+            orders[order["id"]] = order
+
+        self._cache[key] = orders
+        if len(self._cache) > self._cached_blocks:
+            self._cache.popitem(last=False)
+        return orders
 
-        if not product:
-            return None
 
-        product["stock"] -= quantity
-        discounted_price = self._calculate_discounted_price(
-            product["price"], discount_rate
+# ✅ Agregados por cliente mantenidos al vuelo: alta y cancelación en O(1)
+# ✅ Las órdenes de cada cliente se guardan en orden de llegada (id -> fecha),
+# ✅ así la última fecha sigue siendo O(1) aunque se cancele la orden más reciente
+class CustomerOrderIndex:
+    def __init__(self):
+        self._orders: Dict[int, Dict[int, datetime]] = {}
+        self._totals: Dict[int, float] = {}
+
+    def add(self, order: Order) -> None:
+        customer_id = order["customer_id"]
+        self._orders.setdefault(customer_id, {})[order["id"]] = order["date"]
+        self._totals[customer_id] = self._totals.get(customer_id, 0.0) + order["total"]
+
+    def remove(self, order: Order) -> None:
+        customer_id = order["customer_id"]
+        orders = self._orders.get(customer_id)
+        if orders is None or orders.pop(order["id"], None) is None:
+            return
+
+        if orders:
+            self._totals[customer_id] -= order["total"]
+        else:
+            del self._orders[customer_id]
+            del self._totals[customer_id]
+
+    def order_ids(self, customer_id: int) -> List[int]:
+        return list(self._orders.get(customer_id, ()))
+
+    def stats(self, customer_id: int) -> CustomerStats:
+        orders = self._orders.get(customer_id)
+        if not orders:
+            return CustomerStats(0, 0.0, None)
+
+        return CustomerStats(
+            len(orders), self._totals[customer_id], next(reversed(orders.values()))
         )
 
-        print(
-            f"Producto {product['name']} actualizado. "
-            f"Stock: {product['stock']}, "
-            f"Precio con descuento: {discounted_price}"
+
+# ✅ Filtro de Bloom: tamaño y número de hashes calculados desde capacidad y tasa de
+# ✅ falsos positivos; las posiciones salen de la propia clave (doble hashing)
+class BloomFilter:
+    def __init__(self, capacity: int, false_positive_rate: float):
+        bits = math.ceil(-capacity * math.log(false_positive_rate) / math.log(2) ** 2)
+        self._bits = bytearray((bits + 7) // 8)
+        self._size = len(self._bits) * 8
+        self._hashes = max(1, round(self._size / capacity * math.log(2)))
+
+    def add(self, key: bytes) -> None:
+        for position in self._positions(key):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key: bytes) -> bool:
+        return all(
+            self._bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(key)
         )
 
-        result = product.copy()
-        result["discounted_price"] = discounted_price
-        return result
+    def _positions(self, key: bytes) -> Iterator[int]:
+        first = int.from_bytes(key[:8], "little")
+        step = int.from_bytes(key[8:16], "little") | 1
+        return ((first + i * step) % self._size for i in range(self._hashes))
 
-    def _find_product_by_id(self, product_id: int) -> Optional[Product]:
-        return next((p for p in self.products if p["id"] == product_id), None)
 
-    def _calculate_discounted_price(self, price: float, discount_rate: float) -> float:
-        return price * discount_rate
+# ✅ Guardia de idempotencia: clave blake2b de (cliente, ítems, token del cliente)
+# ✅ Las claves recientes viven en una caché exacta acotada; la ventana larga la cubren
+# ✅ dos filtros de Bloom que rotan, así cada clave se recuerda al menos `window_seconds`
+# ✅ También rotan al llenarse (`window_capacity` claves): un filtro saturado daría
+# ✅ falsos positivos; en ráfagas la memoria cubre las últimas 1-2 capacidades
+class IdempotencyGuard:
+    RECENT_KEYS = 10_000
+    WINDOW_SECONDS = 3_600.0
+    WINDOW_CAPACITY = 100_000
+    FALSE_POSITIVE_RATE = 0.001
 
+    def __init__(
+        self,
+        recent_keys: int = RECENT_KEYS,
+        window_seconds: float = WINDOW_SECONDS,
+        window_capacity: int = WINDOW_CAPACITY,
+        false_positive_rate: float = FALSE_POSITIVE_RATE,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._recent_keys = recent_keys
+        self._window_seconds = window_seconds
+        self._new_filter = lambda: BloomFilter(window_capacity, false_positive_rate)
+        self._clock = clock
+        self._recent: "OrderedDict[bytes, None]" = OrderedDict()
+        self._window_capacity = window_capacity
+        self._current = self._new_filter()
+        self._previous = self._new_filter()
+        self._current_keys = 0
+        self._rotated_at = clock()
 
-# ✅ Espaciado vertical apropiado
-# ✅ Líneas en blanco separan conceptos relacionados
-# ✅ Métodos relacionados están cerca
+    @staticmethod
+    def key(customer_id: int, items: List[OrderItem], client_token: str) -> bytes:
+        payload = (
+            customer_id,
+            [(i["price"], i["quantity"]) for i in items],
+            client_token,
+        )
+        return hashlib.blake2b(repr(payload).encode("utf-8"), digest_size=16).digest()
 
+    def is_duplicate(self, key: bytes) -> bool:
+        self._rotate_if_due()
+        return key in self._recent or key in self._current or key in self._previous
 
-class OrderItem(TypedDict):
-    price: float
-    quantity: int
+    def remember(self, key: bytes) -> None:
+        self._recent[key] = None
+        if len(self._recent) > self._recent_keys:
+            self._recent.popitem(last=False)
+        self._current.add(key)
+        self._current_keys += 1
+        if self._current_keys >= self._window_capacity:
+            self._rotate(self._clock())
 
+    def _rotate_if_due(self) -> None:
+        now = self._clock()
+        if now - self._rotated_at < self._window_seconds:
+            return
 
-class Order(TypedDict):
-    id: float
-    customer_id: int
-    items: List[OrderItem]
-    total: float
-    date: datetime
-    status: str
+        # ✅ Si pasó más de una ventana entera sin tráfico, ambos filtros caducan
+        expired = now - self._rotated_at >= 2 * self._window_seconds
+        self._rotate(now, expired)
+        self._recent.clear()
+
+    def _rotate(self, now: float, expired: bool = False) -> None:
+        self._previous = self._new_filter() if expired else self._current
+        self._current = self._new_filter()
+        self._current_keys = 0
+        self._rotated_at = now
+
+
+# ✅ Ventana deslizante en anillo: un cubo por intervalo de `bucket_seconds`
+# ✅ Los totales de la ventana se mantienen al vuelo: sumar, restar y leer son O(1)
+# ✅ (avanzar la ventana vacía como mucho `buckets` cubos, amortizado O(1))
+class RollingWindow:
+    def __init__(self, bucket_seconds: float, buckets: int):
+        self._bucket_seconds = bucket_seconds
+        self._buckets = buckets
+        self._keys = array("q", [-1]) * buckets
+        self._counts = array("q", [0]) * buckets
+        self._revenue = array("d", [0.0]) * buckets
+        self._discounted = array("q", [0]) * buckets
+        self._latest: Optional[int] = None
+        self.count = 0
+        self.revenue = 0.0
+        self.discounted = 0
+
+    def add(
+        self, timestamp: float, now: float, revenue: float, discounted: bool
+    ) -> None:
+        self._update(timestamp, now, 1, revenue, discounted)
+
+    def subtract(
+        self, timestamp: float, now: float, revenue: float, discounted: bool
+    ) -> None:
+        self._update(timestamp, now, -1, -revenue, discounted)
+
+    def advance(self, now: float) -> None:
+        bucket = int(now // self._bucket_seconds)
+        if self._latest is not None and bucket <= self._latest:
+            return
+
+        first = bucket - self._buckets + 1
+        if self._latest is not None:
+            first = max(first, self._latest + 1)
+        for expired in range(first, bucket + 1):
+            slot = expired % self._buckets
+            self.count -= self._counts[slot]
+            self.revenue -= self._revenue[slot]
+            self.discounted -= self._discounted[slot]
+            self._keys[slot] = expired
+            self._counts[slot] = 0
+            self._revenue[slot] = 0.0
+            self._discounted[slot] = 0
+        self._latest = bucket
+
+    def _update(
+        self, timestamp: float, now: float, count: int, revenue: float, discounted: bool
+    ) -> None:
+        self.advance(max(now, timestamp))
+        bucket = int(timestamp // self._bucket_seconds)
+        slot = bucket % self._buckets
+        # ✅ Fuera de la ventana: ya caducó y no cuenta (ni para sumar ni para restar)
+        if self._keys[slot] != bucket:
+            return
+
+        self._counts[slot] += count
+        self._revenue[slot] += revenue
+        self.count += count
+        self.revenue += revenue
+        if discounted:
+            self._discounted[slot] += count
+            self.discounted += count
+
+
+@dataclass(frozen=True)
+class RollingMetrics:
+    orders_per_second: float
+    revenue_per_minute: float
+    revenue_per_hour: float
+    discounted_share: float
+
+
+# ✅ Métricas de panel: último minuto en cubos de 1 s y última hora en cubos de 1 min
+# ✅ Cada orden cae en el cubo de su fecha; cancelarla resta de ese mismo cubo
+class OrderMetrics:
+    def __init__(self, clock: Callable[[], float] = time.time):
+        self._clock = clock
+        self._minute = RollingWindow(1, 60)
+        self._hour = RollingWindow(60, 60)
+
+    def add(self, order: Order, discounted: bool) -> None:
+        timestamp = order["date"].timestamp()
+        now = self._clock()
+        self._minute.add(timestamp, now, order["total"], discounted)
+        self._hour.add(timestamp, now, order["total"], discounted)
+
+    def subtract(self, order: Order, discounted: bool) -> None:
+        timestamp = order["date"].timestamp()
+        now = self._clock()
+        self._minute.subtract(timestamp, now, order["total"], discounted)
+        self._hour.subtract(timestamp, now, order["total"], discounted)
+
+    def snapshot(self) -> RollingMetrics:
+        now = self._clock()
+        self._minute.advance(now)
+        self._hour.advance(now)
+        hour_orders = self._hour.count
+
+        return RollingMetrics(
+            orders_per_second=self._minute.count / 60,
+            revenue_per_minute=self._minute.revenue,
+            revenue_per_hour=self._hour.revenue,
+            discounted_share=(
+                self._hour.discounted / hour_orders if hour_orders else 0.0
+            ),
+        )
 
 
 class OrderProcessor:
     DISCOUNT_THRESHOLD = 100
     DISCOUNT_RATE = 0.9
 
-    def __init__(self):
-        self.orders: List[Order] = []
+    def __init__(
+        self,
+        id_generator: Optional[OrderIdGenerator] = None,
+        wal: Optional[OrderWriteAheadLog] = None,
+        compact_orders: bool = False,
+        archive: Optional[ColdOrderArchive] = None,
+        idempotency: Optional[IdempotencyGuard] = None,
+        metrics: Optional[OrderMetrics] = None,
+    ):
+        self._store = OrderStore()
+        self._customers = CustomerOrderIndex()
+        self._id_generator = id_generator or _default_id_generator
+        self._wal = wal
+        # ✅ Modo compacto opcional: OrderRecord en vez de dicts para millones de órdenes
+        self._compact_orders = compact_orders
+        self._archive = archive
+        self._idempotency = idempotency
+        self._metrics = metrics or OrderMetrics()
+        # ✅ El índice de clientes solo cubre el nivel caliente; los agregados del
+        # ✅ nivel frío vienen del manifiesto del archivo, sin recorrerlo al arrancar
+        if wal is not None:
+            self._replay(wal)
+
+    @property
+    def orders(self) -> Union[List[Order], OrderCursor]:
+        return self.get_orders()
 
     # ✅ Grupo 1: Procesamiento de órdenes
     def process_order(
-        self, customer_id: int, items: List[OrderItem], payment_method: str
+        self,
+        customer_id: int,
+        items: List[OrderItem],
+        payment_method: str,
+        client_token: Optional[str] = None,
     ) -> bool:
+        key = self._idempotency_key(customer_id, items, client_token)
+        if key is not None and self._idempotency.is_duplicate(key):
+            return False
         if not self._is_valid_order(customer_id, items):
             return False
 
@@ -113,10 +2609,24 @@ class OrderProcessor:
         order = self._create_order(customer_id, items, total)
 
         self._save_order(order)
+        self._remember_submission(key)
         self._log_order_processed(total)
 
         return True
 
+    # ✅ Un reintento idéntico se descarta antes de validar, totalizar o persistir
+    # ✅ Sin token del cliente no se deduplica: dos pedidos iguales pueden ser legítimos
+    def _idempotency_key(
+        self, customer_id: int, items: List[OrderItem], client_token: Optional[str]
+    ) -> Optional[bytes]:
+        if self._idempotency is None or client_token is None or not items:
+            return None
+        return IdempotencyGuard.key(customer_id, items, client_token)
+
+    def _remember_submission(self, key: Optional[bytes]) -> None:
+        if key is not None:
+            self._idempotency.remember(key)
+
     def _is_valid_order(self, customer_id: int, items: List[OrderItem]) -> bool:
         return customer_id > 0 and items and len(items) > 0
 
@@ -128,11 +2638,30 @@ class OrderProcessor:
 
         return total
 
+    # ✅ Totales de millones de órdenes: una reducción por segmento sobre columnas
+    # ✅ En CPython gana poco al camino escalar (~1.1x); lo que ahorra es memoria
+    def calculate_totals_batch(self, batch: OrderItemBatch) -> array:
+        threshold = self.DISCOUNT_THRESHOLD
+        rate = self.DISCOUNT_RATE
+        amounts = array("d", map(operator.mul, batch.prices, batch.quantities))
+        totals = array("d")
+
+        for start, stop in zip(batch.offsets, batch.offsets[1:]):
+            total = sum(amounts[start:stop])
+            totals.append(total * rate if total > threshold else total)
+
+        return totals
+
     def _create_order(
         self, customer_id: int, items: List[OrderItem], total: float
     ) -> Order:
+        if self._compact_orders:
+            return OrderRecord(
+                self._id_generator.next_id(), customer_id, items, total, datetime.now()
+            )
+
         return {
-            "id": datetime.now().timestamp(),
+            "id": self._id_generator.next_id(),
             "customer_id": customer_id,
             "items": items,
             "total": total,
@@ -141,20 +2670,428 @@ class OrderProcessor:
         }
 
     def _save_order(self, order: Order) -> None:
-        self.orders.append(order)
+        if self._wal is not None:
+            self._wal.append_order(order)
+        self._apply_add(order)
+        self._checkpoint_if_due()
 
     def _log_order_processed(self, total: float) -> None:
         print(f"Orden procesada: ${total}")
 
     # ✅ Grupo 2: Consultas de órdenes (separado por línea en blanco)
-    def get_orders(self) -> List[Order]:
-        return self.orders
+    # ✅ Sin filtros ni nivel frío devuelve la lista completa; en otro caso, un cursor
+    # ✅ perezoso que recorre primero el nivel frío y después el caliente, página a
+    # ✅ página: nunca se descomprime todo el histórico de golpe
+    def get_orders(
+        self,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        status: Optional[str] = None,
+        page_size: Optional[int] = None,
+    ) -> Union[List[Order], OrderCursor]:
+        unfiltered = since is None and until is None and status is None
+        if unfiltered and page_size is None and self._archive is None:
+            return list(self._store)
+
+        # ✅ Las órdenes archivadas son las más antiguas: primero el nivel frío
+        cold: Iterable[Order] = ()
+        if self._archive is not None:
+            cold = self._archive.between(since, until)
+        hot = self._store if unfiltered else self._store.between(since, until)
+
+        return OrderCursor(
+            itertools.chain(cold, hot),
+            status,
+            page_size or OrderCursor.DEFAULT_PAGE_SIZE,
+        )
+
+    # ✅ Solo el nivel caliente: su tamaño lo acota el archivado
+    def get_hot_orders(self) -> List[Order]:
+        return list(self._store)
+
+    def get_order(self, order_id: int) -> Optional[Order]:
+        order = self._store.get(order_id)
+        if order is None and self._archive is not None:
+            order = self._archive.get(order_id)
+        return order
+
+    # ✅ Por defecto solo las órdenes calientes; el histórico se pide explícitamente
+    def get_customer_orders(
+        self, customer_id: int, include_archived: bool = False
+    ) -> List[Order]:
+        orders = [
+            self._store.get(order_id)
+            for order_id in self._customers.order_ids(customer_id)
+        ]
+        if include_archived and self._archive is not None:
+            orders[:0] = self._archive.customer_orders(customer_id)
+        return orders
+
+    def customer_stats(self, customer_id: int) -> CustomerStats:
+        hot = self._customers.stats(customer_id)
+        if self._archive is None:
+            return hot
+
+        cold = self._archive.customer_stats(customer_id)
+        return CustomerStats(
+            hot.order_count + cold.order_count,
+            hot.total_spent + cold.total_spent,
+            hot.last_order_date or cold.last_order_date,
+        )
+
+    def rolling_metrics(self) -> RollingMetrics:
+        return self._metrics.snapshot()
 
     # ✅ Grupo 3: Cancelación de órdenes (separado por línea en blanco)
-    def cancel_order(self, order_id: float) -> bool:
-        original_length = len(self.orders)
-        self.orders = [o for o in self.orders if o["id"] != order_id]
-        return len(self.orders) < original_length
+    def cancel_order(self, order_id: int) -> bool:
+        if order_id not in self._store:
+            return self._cancel_archived(order_id)
+
+        if self._wal is not None:
+            self._wal.append_cancel(order_id)
+        self._apply_cancel(order_id)
+        self._checkpoint_if_due()
+        return True
+
+    # ✅ Grupo 4: Persistencia (solo si hay log de escritura anticipada)
+    # ✅ Archivar mueve las órdenes viejas al nivel frío y las saca de la lista caliente.
+    # ✅ El log anota antes la intención: si el proceso cae a medias, el replay
+    # ✅ termina el movimiento y ninguna orden queda en los dos niveles
+    def archive_older_than(self, age: timedelta) -> int:
+        if self._archive is None:
+            raise ValueError("No hay nivel frío configurado")
+
+        cutoff = datetime.now() - age
+        old_ids = [order["id"] for order in self._store.between(until=cutoff) if order]
+        if not old_ids:
+            return 0
+
+        if self._wal is not None:
+            self._wal.append_archive(old_ids)
+        self._apply_archive(old_ids)
+        self.checkpoint()
+        return len(old_ids)
+
+    def checkpoint(self) -> None:
+        if self._wal is not None:
+            self._wal.checkpoint(self._store)
+
+    def close(self) -> None:
+        if self._wal is not None:
+            self._wal.close()
+
+    def _replay(self, wal: OrderWriteAheadLog) -> None:
+        for operation, payload in wal.replay():
+            if operation == "add":
+                if self._compact_orders:
+                    payload = OrderRecord.from_order(payload)
+                self._apply_add(payload)
+            elif operation == "archive":
+                if self._archive is None:
+                    raise ValueError("El log contiene un archivado sin nivel frío")
+                self._apply_archive(payload)
+            else:
+                self._apply_cancel(payload)
+
+    # ✅ Altas y bajas pasan por aquí tanto en vivo como en el replay del log
+    def _apply_add(self, order: Order) -> None:
+        self._store.add(order)
+        self._customers.add(order)
+        self._metrics.add(order, self._is_discounted(order))
+
+    def _apply_cancel(self, order_id: int) -> None:
+        for order in self._store.remove(order_id):
+            self._customers.remove(order)
+            self._metrics.subtract(order, self._is_discounted(order))
+
+    def _apply_archive(self, order_ids: List[int]) -> None:
+        orders = [self._store.get(order_id) for order_id in order_ids]
+        orders = [order for order in orders if order is not None]
+        self._archive.archive(orders)
+        for order in orders:
+            self._store.remove(order["id"])
+            self._customers.remove(order)
+
+    def _is_discounted(self, order: Order) -> bool:
+        items = order["items"]
+        return (
+            sum(item["price"] * item["quantity"] for item in items)
+            > self.DISCOUNT_THRESHOLD
+        )
+
+    def _cancel_archived(self, order_id: int) -> bool:
+        if self._archive is None:
+            return False
+
+        order = self._archive.cancel(order_id)
+        if order is None:
+            return False
+        self._metrics.subtract(order, self._is_discounted(order))
+        return True
+
+    def _checkpoint_if_due(self) -> None:
+        if self._wal is not None and self._wal.checkpoint_due:
+            self.checkpoint()
+
+
+# ✅ Versión asyncio: reutiliza validación, totales y almacén del procesador síncrono
+# ✅ Persistencia y log salen del camino crítico hacia una cola acotada; si los
+# ✅ consumidores van lentos, la cola llena frena a quien envía (backpressure)
+class AsyncOrderProcessor(OrderProcessor):
+    MAX_CONCURRENCY = 100
+    SINK_QUEUE_SIZE = 1_000
+
+    def __init__(
+        self,
+        id_generator: Optional[OrderIdGenerator] = None,
+        persist: Optional[Callable[[Order], Awaitable[Any]]] = None,
+        log: Optional[Callable[[Order], Awaitable[Any]]] = None,
+        max_concurrency: int = MAX_CONCURRENCY,
+        sink_queue_size: int = SINK_QUEUE_SIZE,
+        idempotency: Optional[IdempotencyGuard] = None,
+    ):
+        super().__init__(id_generator, idempotency=idempotency)
+        self._persist = persist
+        self._log = log or self._log_in_thread
+        self._max_concurrency = max_concurrency
+        self._sink_queue_size = sink_queue_size
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._sink_queue: Optional[asyncio.Queue] = None
+        self._sink_task: Optional[asyncio.Task] = None
+        self.sink_errors: List[Exception] = []
+
+    async def process_order(
+        self,
+        customer_id: int,
+        items: List[OrderItem],
+        payment_method: str,
+        client_token: Optional[str] = None,
+    ) -> bool:
+        self._start_sink()
+        async with self._semaphore:
+            key = self._idempotency_key(customer_id, items, client_token)
+            if key is not None and self._idempotency.is_duplicate(key):
+                return False
+            if not self._is_valid_order(customer_id, items):
+                return False
+
+            total = self._calculate_total(items)
+            order = self._create_order(customer_id, items, total)
+
+            self._save_order(order)
+            self._remember_submission(key)
+            await self._sink_queue.put(order)
+
+        return True
+
+    async def drain(self) -> None:
+        if self._sink_queue is not None:
+            await self._sink_queue.join()
+
+    async def aclose(self) -> None:
+        await self.drain()
+        if self._sink_task is not None:
+            self._sink_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._sink_task
+            self._sink_task = None
+
+    async def __aenter__(self) -> "AsyncOrderProcessor":
+        self._start_sink()
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.aclose()
+
+    # ✅ El semáforo y la cola se crean dentro del bucle de eventos que los usa
+    def _start_sink(self) -> None:
+        if self._sink_task is not None:
+            return
+
+        self._semaphore = asyncio.Semaphore(self._max_concurrency)
+        self._sink_queue = asyncio.Queue(self._sink_queue_size)
+        self._sink_task = asyncio.get_running_loop().create_task(self._run_sink())
+
+    async def _run_sink(self) -> None:
+        while True:
+            order = await self._sink_queue.get()
+            try:
+                if self._persist is not None:
+                    await self._persist(order)
+                await self._log(order)
+            except Exception as error:
+                self.sink_errors.append(error)
+            finally:
+                self._sink_queue.task_done()
+
+    async def _log_in_thread(self, order: Order) -> None:
+        await asyncio.to_thread(self._log_order_processed, order["total"])
+
+
+# ✅ Proceso de un shard: su propio OrderProcessor, con su número de shard como worker_id
+def _run_order_shard(shard: int, connection: Any) -> None:
+    processor = OrderProcessor(SnowflakeIdGenerator(worker_id=shard))
+
+    # ✅ Las órdenes de un cliente salen de su índice, sin recorrer todo el shard
+    def customer_orders(request: Tuple[int, Dict[str, Any]]) -> List[Order]:
+        customer_id, filters = request
+        since, until, status = filters["since"], filters["until"], filters["status"]
+        return [
+            order
+            for order in processor.get_customer_orders(customer_id)
+            if (since is None or order["date"] >= since)
+            and (until is None or order["date"] < until)
+            and (status is None or order["status"] == status)
+        ]
+
+    commands = {
+        "process": lambda batch: [processor.process_order(*order) for order in batch],
+        "get_orders": lambda filters: list(processor.get_orders(**filters)),
+        "customer_orders": customer_orders,
+        "get_order": processor.get_order,
+        "customer_stats": processor.customer_stats,
+        "cancel": processor.cancel_order,
+    }
+
+    while True:
+        command, payload = connection.recv()
+        if command == "stop":
+            break
+
+        # ✅ Un fallo no mata el shard: el error viaja al padre, que lo relanza
+        try:
+            connection.send(("ok", commands[command](payload)))
+        except Exception as error:
+            connection.send(("error", error))
+
+    connection.close()
+
+
+# ✅ Front-end particionado por cliente: cada cliente cae siempre en el mismo shard,
+# ✅ así sus órdenes se procesan en el orden en que llegaron
+# ✅ Los envíos se agrupan por shard para pagar una ida y vuelta por lote, no por orden
+class ShardedOrderProcessor:
+    BATCH_SIZE = 512
+
+    def __init__(self, shards: Optional[int] = None, batch_size: int = BATCH_SIZE):
+        self._batch_size = batch_size
+        self._connections = []
+        self._workers = []
+
+        for shard in range(shards or os.cpu_count() or 1):
+            connection, worker_connection = multiprocessing.Pipe()
+            worker = multiprocessing.Process(
+                target=_run_order_shard, args=(shard, worker_connection), daemon=True
+            )
+            worker.start()
+            worker_connection.close()
+            self._connections.append(connection)
+            self._workers.append(worker)
+
+    @property
+    def shards(self) -> int:
+        return len(self._connections)
+
+    def shard_for(self, customer_id: int) -> int:
+        return hash(customer_id) % self.shards
+
+    # ✅ Grupo 1: Procesamiento de órdenes
+    def process_order(
+        self, customer_id: int, items: List[OrderItem], payment_method: str
+    ) -> bool:
+        return self.process_orders([(customer_id, items, payment_method)])[0]
+
+    def process_orders(
+        self, orders: Iterable[Tuple[int, List[OrderItem], str]]
+    ) -> List[bool]:
+        batches: List[List[Tuple[int, List[OrderItem], str]]] = [
+            [] for _ in range(self.shards)
+        ]
+        slots: List[List[int]] = [[] for _ in range(self.shards)]
+        count = 0
+        for count, order in enumerate(orders, 1):
+            shard = self.shard_for(order[0])
+            batches[shard].append(order)
+            slots[shard].append(count - 1)
+
+        results: List[bool] = [False] * count
+        for start in range(0, max(map(len, batches)), self._batch_size):
+            # ✅ Se envía a todos los shards y luego se recoge: trabajan en paralelo
+            sent = []
+            for shard, batch in enumerate(batches):
+                chunk = batch[start : start + self._batch_size]
+                if chunk:
+                    self._connections[shard].send(("process", chunk))
+                    sent.append(shard)
+
+            for shard, chunk_results in zip(sent, self._collect(sent)):
+                chunk_slots = slots[shard][start : start + self._batch_size]
+                for slot, result in zip(chunk_slots, chunk_results):
+                    results[slot] = result
+
+        return results
+
+    # ✅ Grupo 2: Consultas de órdenes
+    def get_orders(
+        self,
+        customer_id: Optional[int] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        status: Optional[str] = None,
+    ) -> List[Order]:
+        filters = {"since": since, "until": until, "status": status}
+        if customer_id is not None:
+            return self._request(
+                self.shard_for(customer_id), "customer_orders", (customer_id, filters)
+            )
+
+        per_shard = self._broadcast("get_orders", filters)
+        return sorted(itertools.chain.from_iterable(per_shard), key=lambda o: o["date"])
+
+    def get_order(self, order_id: int) -> Optional[Order]:
+        return self._request(self._shard_of_order(order_id), "get_order", order_id)
+
+    def customer_stats(self, customer_id: int) -> CustomerStats:
+        return self._request(self.shard_for(customer_id), "customer_stats", customer_id)
+
+    # ✅ Grupo 3: Cancelación, enrutada por el worker_id grabado en el id
+    def cancel_order(self, order_id: int) -> bool:
+        return self._request(self._shard_of_order(order_id), "cancel", order_id)
+
+    def close(self) -> None:
+        for connection in self._connections:
+            connection.send(("stop", None))
+            connection.close()
+        for worker in self._workers:
+            worker.join()
+        self._connections = []
+        self._workers = []
+
+    def __enter__(self) -> "ShardedOrderProcessor":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def _shard_of_order(self, order_id: int) -> int:
+        return SnowflakeIdGenerator.worker_of(order_id) % self.shards
+
+    def _request(self, shard: int, command: str, payload: Any) -> Any:
+        self._connections[shard].send((command, payload))
+        return self._collect([shard])[0]
+
+    def _broadcast(self, command: str, payload: Any) -> List[Any]:
+        for connection in self._connections:
+            connection.send((command, payload))
+        return self._collect(range(self.shards))
+
+    # ✅ Se leen todas las respuestas antes de relanzar: ninguna tubería queda desfasada
+    def _collect(self, shards: Iterable[int]) -> List[Any]:
+        replies = [self._connections[shard].recv() for shard in shards]
+        for status, result in replies:
+            if status == "error":
+                raise result
+        return [result for _, result in replies]
 
 
 # ✅ Formato consistente en toda la clase
@@ -207,6 +3144,434 @@ class Calculator:
         return a / b
 
 
+# ✅ Benchmarks: se ejecutan con `python format_good.py --bench`
+def _best_time_ms(action: Callable[[], Any], repeat: int = 3) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        action()
+        timings.append(time.perf_counter() - start)
+
+    return min(timings) * 1000
+
+
+def _allocated_bytes(action: Callable[[], Any]) -> int:
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        retained = action()
+        after, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    del retained
+    return after - before
+
+
+def _synthetic_products(size: int) -> List[Product]:
+    return [
+        {
+            "id": product_id,
+            "name": f"Producto {product_id}",
+            "price": float(product_id % 500 + 1),
+            "category": f"Categoria {product_id % 20}",
+            "stock": 1_000_000,
+            "supplier": f"Proveedor {product_id % 50}",
+            "warranty": "1 year",
+            "discounted_price": None,
+        }
+        for product_id in range(size)
+    ]
+
+
+def benchmark_bulk_repricing(size: int = 100_000) -> Dict[str, float]:
+    product_ids = list(range(size))
+    quantities = [1] * size
+    per_product = ProductService(ProductCatalog(_synthetic_products(size)))
+    columnar = ProductService(ColumnarProductCatalog(_synthetic_products(size)))
+
+    def reprice_one_by_one() -> None:
+        update = (
+            per_product.find_product_by_id_and_update_stock_and_calculate_discount_and_send_notification
+        )
+        with contextlib.redirect_stdout(io.StringIO()):
+            for product_id in product_ids:
+                update(product_id, 1, 0.8)
+
+    return {
+        "per_product_loop_ms": _best_time_ms(reprice_one_by_one),
+        "columnar_bulk_ms": _best_time_ms(
+            lambda: columnar.apply_bulk_discount(product_ids, 0.8, quantities)
+        ),
+    }
+
+
+def benchmark_striped_reservations(
+    size: int = 1_000, threads: int = 8, operations: int = 20_000
+) -> Dict[str, float]:
+    def reserve_and_commit(service: ProductService) -> None:
+        def worker(seed: int) -> None:
+            rng = random.Random(seed)
+            for _ in range(operations):
+                reservation_id = service.reserve(rng.randrange(size), 1)
+                service.commit(reservation_id)
+
+        pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+        for thread in pool:
+            thread.start()
+        for thread in pool:
+            thread.join()
+
+    results = {}
+    for label, stripes in (("global_lock_ms", 1), ("striped_locks_ms", 64)):
+        service = ProductService(ProductCatalog(_synthetic_products(size)), stripes)
+        results[label] = _best_time_ms(lambda: reserve_and_commit(service))
+
+    return results
+
+
+def benchmark_result_allocations(calls: int = 10_000) -> Dict[str, float]:
+    service = ProductService()
+    update = (
+        service.find_product_by_id_and_update_stock_and_calculate_discount_and_send_notification
+    )
+    modes = {
+        "copy_bytes_per_call": lambda: update(1, 0, 0.8),
+        "view_bytes_per_call": lambda: update(1, 0, 0.8, copy_result=False),
+        "price_only_bytes_per_call": (
+            lambda: service.update_stock_and_get_discounted_price(1, 0, 0.8)
+        ),
+    }
+
+    results = {}
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for label, call in modes.items():
+            allocated = _allocated_bytes(lambda: [call() for _ in range(calls)])
+            results[label] = allocated / calls
+
+    return results
+
+
+def benchmark_parallel_repricing(size: int = 2_000_000) -> Dict[str, float]:
+    catalog = ColumnarProductCatalog(_synthetic_products(size))
+
+    return {
+        f"{workers}_workers_ms": _best_time_ms(
+            lambda: catalog.reprice_all(0.8, workers), repeat=1
+        )
+        for workers in (1, 2, 4, 8)
+    }
+
+
+def benchmark_coalesced_stock_writes(
+    size: int = 10_000, writes: int = 200_000
+) -> Dict[str, float]:
+    rng = random.Random(42)
+    hot_ids = [min(int(rng.paretovariate(1.2)), size) - 1 for _ in range(writes)]
+    direct = ProductService(ProductCatalog(_synthetic_products(size)))
+    coalesced = ProductService(ProductCatalog(_synthetic_products(size)))
+
+    def write_directly() -> None:
+        for product_id in hot_ids:
+            direct._change_stock(product_id, -1)
+
+    def write_coalesced() -> None:
+        for product_id in hot_ids:
+            coalesced.buffer_stock_change(product_id, -1)
+        coalesced.flush_stock_changes()
+
+    return {
+        "direct_ms": _best_time_ms(write_directly),
+        "coalesced_ms": _best_time_ms(write_coalesced),
+    }
+
+
+def benchmark_order_ids(count: int = 200_000) -> Dict[str, float]:
+    generator = SnowflakeIdGenerator(worker_id=0)
+
+    def timestamp_ids() -> None:
+        for _ in range(count):
+            datetime.now().timestamp()
+            datetime.now()
+
+    def snowflake_ids() -> None:
+        for _ in range(count):
+            generator.next_id()
+            datetime.now()
+
+    return {
+        "two_datetime_now_ms": _best_time_ms(timestamp_ids),
+        "snowflake_plus_one_now_ms": _best_time_ms(snowflake_ids),
+    }
+
+
+def benchmark_batch_totals(orders: int = 200_000) -> Dict[str, float]:
+    rng = random.Random(7)
+    orders_items = [
+        [
+            {"price": float(rng.randint(1, 200)), "quantity": rng.randint(1, 5)}
+            for _ in range(rng.randint(1, 6))
+        ]
+        for _ in range(orders)
+    ]
+    batch = OrderItemBatch.from_orders(orders_items)
+    processor = OrderProcessor()
+
+    return {
+        "scalar_ms": _best_time_ms(
+            lambda: [processor._calculate_total(items) for items in orders_items]
+        ),
+        "batch_ms": _best_time_ms(lambda: processor.calculate_totals_batch(batch)),
+    }
+
+
+def benchmark_order_wal(orders: int = 2_000) -> Dict[str, float]:
+    items = [{"price": 25.0, "quantity": 2}]
+
+    def process_all(group_commit_size: int) -> None:
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "orders.wal")
+            with OrderWriteAheadLog(path, group_commit_size=group_commit_size) as wal:
+                processor = OrderProcessor(wal=wal)
+                with contextlib.redirect_stdout(io.StringIO()):
+                    for customer_id in range(1, orders + 1):
+                        processor.process_order(customer_id, items, "card")
+
+    def replay_all() -> None:
+        with OrderWriteAheadLog(path) as wal:
+            OrderProcessor(wal=wal)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "orders.wal")
+        with OrderWriteAheadLog(path, checkpoint_every=orders + 1) as wal:
+            processor = OrderProcessor(wal=wal)
+            with contextlib.redirect_stdout(io.StringIO()):
+                for customer_id in range(1, orders + 1):
+                    processor.process_order(customer_id, items, "card")
+
+        return {
+            "fsync_per_order_ms": _best_time_ms(lambda: process_all(1), repeat=1),
+            "group_commit_ms": _best_time_ms(lambda: process_all(64), repeat=1),
+            "replay_ms": _best_time_ms(replay_all),
+        }
+
+
+def benchmark_order_date_range(
+    days: int = 30, orders: int = 200_000
+) -> Dict[str, float]:
+    start = datetime(2024, 1, 1).timestamp()
+    step = days * 86_400 / orders
+    store = OrderStore()
+    for order_id in range(orders):
+        store.add(
+            {
+                "id": order_id,
+                "customer_id": 1,
+                "items": [],
+                "total": 10.0,
+                "date": datetime.fromtimestamp(start + order_id * step),
+                "status": "pending",
+            }
+        )
+
+    since = datetime.fromtimestamp(start + 15 * 86_400)
+    until = datetime.fromtimestamp(start + 15 * 86_400 + 3_600)
+
+    return {
+        "filter_all_ms": _best_time_ms(
+            lambda: [order for order in store if since <= order["date"] < until]
+        ),
+        "date_index_ms": _best_time_ms(lambda: list(store.cursor(since, until))),
+    }
+
+
+def benchmark_async_orders(submissions: int = 10_000) -> Dict[str, float]:
+    items = [{"price": 25.0, "quantity": 2}]
+
+    async def persist(order: Order) -> None:
+        await asyncio.sleep(0)
+
+    async def log(order: Order) -> None:
+        pass
+
+    async def submit(processor: AsyncOrderProcessor, customer_id: int) -> float:
+        start = time.perf_counter()
+        await processor.process_order(customer_id, items, "card")
+        return (time.perf_counter() - start) * 1000
+
+    async def run() -> List[float]:
+        async with AsyncOrderProcessor(persist=persist, log=log) as processor:
+            customer_ids = range(1, submissions + 1)
+            return await asyncio.gather(
+                *(submit(processor, customer_id) for customer_id in customer_ids)
+            )
+
+    latencies = sorted(asyncio.run(run()))
+
+    return {
+        "p50_ms": latencies[len(latencies) // 2],
+        "p99_ms": latencies[len(latencies) * 99 // 100],
+    }
+
+
+def benchmark_sharded_orders(orders: int = 20_000) -> Dict[str, float]:
+    submissions = [
+        (customer_id % 1_000 + 1, [{"price": 25.0, "quantity": 2}], "card")
+        for customer_id in range(orders)
+    ]
+
+    def process_single() -> None:
+        processor = OrderProcessor()
+        for submission in submissions:
+            processor.process_order(*submission)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        single_ms = _best_time_ms(process_single, repeat=1)
+
+    # ✅ Los shards escriben su log a /dev/null para medir solo el procesamiento
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        with ShardedOrderProcessor() as sharded:
+            sharded_ms = _best_time_ms(
+                lambda: sharded.process_orders(submissions), repeat=1
+            )
+
+    return {"single_process_ms": single_ms, "sharded_ms": sharded_ms}
+
+
+def benchmark_order_memory(orders: int = 100_000) -> Dict[str, float]:
+    items = [{"price": 19.99, "quantity": 2}, {"price": 5.5, "quantity": 1}]
+    results = {}
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for label, compact in (("dict", False), ("record", True)):
+            # ✅ Cada orden trae su propia lista de ítems, como llegaría de una petición
+            def process_all() -> OrderProcessor:
+                processor = OrderProcessor(compact_orders=compact)
+                for customer_id in range(1, orders + 1):
+                    processor.process_order(
+                        customer_id, [dict(i) for i in items], "card"
+                    )
+                return processor
+
+            results[f"{label}_bytes_per_order"] = _allocated_bytes(process_all) / orders
+
+    return results
+
+
+def benchmark_customer_stats(orders: int = 200_000) -> Dict[str, float]:
+    processor = OrderProcessor()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for order in range(orders):
+            processor.process_order(
+                order % 1_000 + 1, [{"price": 25.0, "quantity": 2}], "card"
+            )
+
+    def scan() -> Tuple[int, float]:
+        mine = [o for o in processor.get_orders() if o["customer_id"] == 42]
+        return len(mine), sum(o["total"] for o in mine)
+
+    return {
+        "scan_ms": _best_time_ms(scan),
+        "aggregates_ms": _best_time_ms(lambda: processor.customer_stats(42)),
+    }
+
+
+def benchmark_cold_orders(orders: int = 100_000) -> Dict[str, float]:
+    with tempfile.TemporaryDirectory() as directory:
+        archive = ColdOrderArchive(directory)
+        processor = OrderProcessor(archive=archive)
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            for order in range(orders):
+                processor.process_order(
+                    order % 1_000 + 1, [{"price": 25.0, "quantity": 2}], "card"
+                )
+        ids = [order["id"] for order in processor.get_orders()]
+        processor.archive_older_than(timedelta(seconds=-1))
+
+        probes = random.Random(3).sample(ids, 1_000)
+        lookups_ms = _best_time_ms(lambda: [processor.get_order(i) for i in probes])
+        reopen_ms = _best_time_ms(
+            lambda: OrderProcessor(archive=ColdOrderArchive(directory)).customer_stats(
+                1
+            )
+        )
+
+        return {
+            "cold_lookup_us": lookups_ms / len(probes) * 1000,
+            "reopen_ms": reopen_ms,
+            "hot_orders": len(processor._store),
+            "cold_orders": len(archive),
+        }
+
+
+def benchmark_duplicate_submissions(orders: int = 20_000) -> Dict[str, float]:
+    processor = OrderProcessor(idempotency=IdempotencyGuard())
+    submissions = [
+        (order % 1_000 + 1, [{"price": 25.0, "quantity": 2}], "card", f"token-{order}")
+        for order in range(orders)
+    ]
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        first_ms = _best_time_ms(
+            lambda: [
+                processor.process_order(*submission) for submission in submissions
+            ],
+            repeat=1,
+        )
+        retry_ms = _best_time_ms(
+            lambda: [processor.process_order(*submission) for submission in submissions]
+        )
+
+    return {
+        "first_submission_us": first_ms / orders * 1000,
+        "rejected_retry_us": retry_ms / orders * 1000,
+    }
+
+
+def benchmark_rolling_metrics(orders: int = 200_000) -> Dict[str, float]:
+    processor = OrderProcessor()
+    items = [{"price": 25.0, "quantity": 2}]
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for order in range(orders):
+            processor.process_order(order % 1_000 + 1, items, "card")
+
+    def recompute() -> float:
+        since = datetime.now() - timedelta(hours=1)
+        recent = (order for order in processor.get_orders() if order["date"] >= since)
+        return sum(order["total"] for order in recent)
+
+    return {
+        "recompute_ms": _best_time_ms(recompute),
+        "rolling_ms": _best_time_ms(processor.rolling_metrics),
+    }
+
+
+def run_benchmarks() -> None:
+    benchmarks = [
+        benchmark_bulk_repricing,
+        benchmark_striped_reservations,
+        benchmark_result_allocations,
+        benchmark_parallel_repricing,
+        benchmark_coalesced_stock_writes,
+        benchmark_order_ids,
+        benchmark_batch_totals,
+        benchmark_order_wal,
+        benchmark_order_date_range,
+        benchmark_async_orders,
+        benchmark_sharded_orders,
+        benchmark_order_memory,
+        benchmark_customer_stats,
+        benchmark_cold_orders,
+        benchmark_duplicate_submissions,
+        benchmark_rolling_metrics,
+    ]
+
+    for benchmark in benchmarks:
+        print(f"{benchmark.__name__}:")
+        for label, value in benchmark().items():
+            print(f"  {label}: {value:,.1f}")
+
+
 if __name__ == "__main__":
     # Uso - También con buen formato
     print("=== Cumplimiento de Formato en Clean Code ===")
@@ -220,3 +3585,6 @@ if __name__ == "__main__":
     processor = OrderProcessor()
     items: List[OrderItem] = [{"price": 100, "quantity": 2}]
     processor.process_order(1, items, "credit_card")
+
+    if "--bench" in sys.argv:
+        run_benchmarks()
@@ -3,9 +3,54 @@ Tests para el concepto de Format en Clean Code
 Valida tanto las implementaciones malas como las buenas
 """
 
+import asyncio
+import gc
+import json
+import multiprocessing
+import threading
+import time
+from datetime import datetime, timedelta
+
 import pytest
 from format_bad import Calculator as CalculatorBad
 from format_good import Calculator as CalculatorGood
+from format_good import (
+    AsyncOrderProcessor,
+    CatalogImporter,
+    ColdOrderArchive,
+    CustomerStats,
+    IdempotencyGuard,
+    OrderItemBatch,
+    OrderMetrics,
+    OrderProcessor,
+    OrderRecord,
+    OrderWriteAheadLog,
+    OrderStore,
+    ColumnarProductCatalog,
+    MappedProductCatalog,
+    ProductCatalog,
+    ProductService,
+    RollingMetrics,
+    ShardedOrderProcessor,
+    SnowflakeIdGenerator,
+    StockDeltaBuffer,
+    VersionedProductCatalog,
+)
+
+
+def make_product(product_id, category="Electronics", supplier="TechCorp", **fields):
+    product = {
+        "id": product_id,
+        "name": f"Producto {product_id}",
+        "price": 10.0 * product_id,
+        "category": category,
+        "stock": 100,
+        "supplier": supplier,
+        "warranty": "1 year",
+        "discounted_price": None,
+    }
+    product.update(fields)
+    return product
 
 
 class TestFormatBad:
@@ -83,5 +128,1603 @@ class TestFormatGood:
         assert "Error" in result
 
 
+class TestProductCatalogIndexes:
+    """Tests para los índices del catálogo de productos"""
+
+    def test_find_by_id_after_stock_update(self):
+        """Verifica que la búsqueda por id refleja el stock actualizado"""
+        service = ProductService()
+        result = service.find_product_by_id_and_update_stock_and_calculate_discount_and_send_notification(
+            1, 5, 0.8
+        )
+        assert result["stock"] == 45
+        assert result["discounted_price"] == 960
+        assert service.products[0]["stock"] == 45
+
+    def test_unknown_product_returns_none(self):
+        """Verifica que un id inexistente devuelve None"""
+        service = ProductService()
+        assert (
+            service.find_product_by_id_and_update_stock_and_calculate_discount_and_send_notification(
+                99, 1, 0.5
+            )
+            is None
+        )
+
+    def test_find_by_category_and_supplier(self):
+        """Verifica las consultas por categoría y proveedor"""
+        service = ProductService()
+        service.add_product(make_product(3, category="Accessories", supplier="Acme"))
+
+        accessories = service.find_products_by_category("Accessories")
+        assert [p["id"] for p in accessories] == [2, 3]
+        assert [p["id"] for p in service.find_products_by_supplier("Acme")] == [3]
+
+    def test_indexes_follow_price_changes_and_upserts(self):
+        """Verifica que los índices siguen consistentes tras cambios"""
+        service = ProductService()
+        service.update_price(1, 999)
+        assert service.find_products_by_category("Electronics")[0]["price"] == 999
+
+        service.add_product(make_product(1, category="Gaming"))
+        assert service.find_products_by_category("Electronics") == []
+        assert [p["id"] for p in service.find_products_by_category("Gaming")] == [1]
+
+
+class TestColumnarProductCatalog:
+    """Tests para el catálogo columnar y el reprecio masivo"""
+
+    def test_columnar_matches_dict_catalog(self):
+        """Verifica que ambos catálogos producen el mismo resultado"""
+        products = [make_product(product_id) for product_id in range(1, 6)]
+        dict_service = ProductService(ProductCatalog([dict(p) for p in products]))
+        columnar_service = ProductService(ColumnarProductCatalog(products))
+
+        for service in (dict_service, columnar_service):
+            service.apply_bulk_discount([1, 3, 5], 0.5, [10, 20, 30])
+
+        assert columnar_service.products == dict_service.products
+        assert columnar_service.products[2]["discounted_price"] == 15
+        assert columnar_service.products[2]["stock"] == 80
+        assert columnar_service.products[1]["discounted_price"] is None
+
+    def test_bulk_update_unknown_id_changes_nothing(self):
+        """Verifica que un id desconocido aborta el lote completo"""
+        service = ProductService(ColumnarProductCatalog([make_product(1)]))
+
+        with pytest.raises(KeyError):
+            service.apply_bulk_discount([1, 42], 0.5, [1, 1])
+
+        assert service.products[0]["stock"] == 100
+        assert service.products[0]["discounted_price"] is None
+
+    @pytest.mark.parametrize(
+        "catalog_class",
+        [ProductCatalog, ColumnarProductCatalog, VersionedProductCatalog],
+    )
+    def test_bulk_update_rejects_mismatched_quantities(self, catalog_class):
+        """Verifica que faltar una cantidad aborta el lote completo"""
+        catalog = catalog_class([make_product(1), make_product(2)])
+        service = ProductService(catalog)
+
+        with pytest.raises(ValueError):
+            service.apply_bulk_discount([1, 2], 0.5, [5])
+
+        assert [p["stock"] for p in service.products] == [100, 100]
+        assert [p["discounted_price"] for p in service.products] == [None, None]
+
+    def test_columnar_supports_service_operations(self):
+        """Verifica que el servicio funciona igual sobre columnas"""
+        service = ProductService(ColumnarProductCatalog([make_product(1)]))
+        result = service.find_product_by_id_and_update_stock_and_calculate_discount_and_send_notification(
+            1, 5, 0.8
+        )
+        assert result["stock"] == 95
+        assert result["discounted_price"] == 8
+        assert service.find_products_by_category("Electronics")[0]["stock"] == 95
+
+
+class TestStockAdjustments:
+    """Tests para el lote de ajustes de stock"""
+
+    def test_applies_all_lines_and_notifies_once(self, capsys):
+        """Verifica que el lote se aplica con una sola notificación"""
+        service = ProductService()
+        summary = service.apply_stock_adjustments(
+            [(1, 5, 0.8), (2, 10, 0.5), (1, 3, 0.9)]
+        )
+
+        assert service.products[0]["stock"] == 42
+        assert service.products[1]["stock"] == 190
+        assert summary.lines == 3
+        assert summary.products == 2
+        assert summary.total_quantity == 18
+        assert summary.discounted_prices == {1: 1080, 2: 12.5}
+        assert len(capsys.readouterr().out.splitlines()) == 1
+
+    def test_invalid_line_rejects_whole_batch(self):
+        """Verifica que una línea inválida no aplica ningún ajuste"""
+        service = ProductService()
+
+        with pytest.raises(ValueError, match=r"\[1, 2\]"):
+            service.apply_stock_adjustments([(1, 5, 0.8), (99, 1, 0.8), (2, 1, 0)])
+
+        assert service.products[0]["stock"] == 50
+
+
+class TestStockReservations:
+    """Tests para las reservas de stock concurrentes"""
+
+    def test_reserve_commit_and_release(self):
+        """Verifica el ciclo de vida de una reserva"""
+        service = ProductService()
+        committed = service.reserve(1, 10)
+        released = service.reserve(1, 5)
+        assert service.products[0]["stock"] == 35
+
+        assert service.commit(committed)
+        assert service.release(released)
+        assert service.products[0]["stock"] == 40
+        assert not service.release(committed)
+
+    def test_reserve_rejects_insufficient_stock(self):
+        """Verifica que no se reserva más stock del disponible"""
+        service = ProductService()
+        assert service.reserve(1, 51) is None
+        assert service.reserve(99, 1) is None
+
+    @pytest.mark.parametrize("quantity", [0, -5])
+    def test_reserve_rejects_non_positive_quantity(self, quantity):
+        """Verifica que una reserva no puede sumar stock"""
+        service = ProductService()
+
+        with pytest.raises(ValueError):
+            service.reserve(1, quantity)
+        assert service.products[0]["stock"] == 50
+
+    def test_concurrent_reservations_never_oversell(self):
+        """Verifica que varios hilos no venden más stock del existente"""
+        service = ProductService(lock_stripes=4)
+        reservations = []
+
+        def worker():
+            for _ in range(200):
+                reservation_id = service.reserve(1, 1)
+                if reservation_id is not None:
+                    reservations.append(reservation_id)
+                service.reserve(2, 1)
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(reservations) == 50
+        assert service.products[0]["stock"] == 0
+        assert service.products[1]["stock"] == 0
+
+
+class TestMappedProductCatalog:
+    """Tests para el catálogo binario mapeado en memoria"""
+
+    def test_round_trip_and_lookup(self, tmp_path):
+        """Verifica que los productos se leen igual que se escribieron"""
+        path = str(tmp_path / "catalog.bin")
+        products = [make_product(product_id) for product_id in (5, 1, 3)]
+        products[0]["discounted_price"] = 25.0
+        MappedProductCatalog.write(path, products)
+
+        with MappedProductCatalog(path) as catalog:
+            assert len(catalog) == 3
+            assert catalog.get(5) == products[0]
+            assert catalog.get(2) is None
+            assert [p["id"] for p in catalog] == [1, 3, 5]
+
+    def test_changes_persist_only_after_save(self, tmp_path):
+        """Verifica que stock, renombrados y altas persisten juntos al guardar"""
+        path = str(tmp_path / "catalog.bin")
+        MappedProductCatalog.write(path, [make_product(1), make_product(2)])
+
+        with MappedProductCatalog(path) as catalog:
+            service = ProductService(catalog)
+            service.reserve(1, 30)
+            service.rename_product(2, "Renamed")
+            service.reserve(2, 7)
+            service.add_product(make_product(3))
+
+            assert catalog.get(2)["stock"] == 93
+
+        with MappedProductCatalog(path) as catalog:
+            assert [p["stock"] for p in catalog] == [100, 100]
+            service = ProductService(catalog)
+            service.reserve(1, 30)
+            service.rename_product(2, "Renamed")
+            service.reserve(2, 7)
+            service.add_product(make_product(3))
+            catalog.save()
+
+        with MappedProductCatalog(path) as catalog:
+            assert [p["stock"] for p in catalog] == [70, 93, 100]
+            assert catalog.get(2)["name"] == "Renamed"
+
+    def test_new_products_and_indexes(self, tmp_path):
+        """Verifica altas en memoria e índices secundarios perezosos"""
+        path = str(tmp_path / "catalog.bin")
+        MappedProductCatalog.write(path, [make_product(1), make_product(2)])
+
+        with MappedProductCatalog(path) as catalog:
+            service = ProductService(catalog)
+            service.add_product(make_product(3, category="Gaming"))
+            service.add_product(make_product(1, category="Gaming"))
+
+            assert len(catalog) == 3
+            gaming = service.find_products_by_category("Gaming")
+            assert sorted(p["id"] for p in gaming) == [1, 3]
+
+
+class TestCatalogImporter:
+    """Tests para la importación del catálogo en streaming"""
+
+    def test_import_csv_upserts_products(self, tmp_path):
+        """Verifica que el CSV crea y actualiza productos"""
+        path = tmp_path / "catalog.csv"
+        path.write_text(
+            "id,name,price,category,stock,supplier,warranty,discounted_price\n"
+            "1,Laptop Pro,1500,Electronics,10,TechCorp,3 years,\n"
+            "3,Keyboard,45.5,Accessories,80,KeyCo,1 year,40\n",
+            encoding="utf-8",
+        )
+        service = ProductService()
+
+        progress = CatalogImporter(service).import_csv(str(path))
+
+        assert progress.rows_imported == 2
+        assert service.products[0]["name"] == "Laptop Pro"
+        assert service.products[0]["discounted_price"] is None
+        assert service.products[2]["price"] == 45.5
+        assert service.products[2]["discounted_price"] == 40.0
+
+    def test_import_jsonl_rejects_invalid_rows(self, tmp_path):
+        """Verifica que las filas inválidas se cuentan y no se importan"""
+        path = tmp_path / "catalog.jsonl"
+        valid = make_product(3)
+        invalid = make_product(4, price="gratis")
+        path.write_text(
+            "\n".join(json.dumps(row) for row in (valid, invalid)), encoding="utf-8"
+        )
+        service = ProductService()
+
+        progress = CatalogImporter(service).import_jsonl(str(path))
+
+        assert progress.rows_read == 2
+        assert progress.rows_rejected == 1
+        assert len(progress.errors) == 1
+        assert len(service.products) == 3
+
+    @pytest.mark.parametrize(
+        "fields",
+        [{"id": True}, {"stock": 3.7}, {"stock": "3"}, {"price": "10"}, {"name": 7}],
+    )
+    def test_import_jsonl_does_not_coerce_values(self, tmp_path, fields):
+        """Verifica que JSON con tipos incorrectos se rechaza en vez de convertirse"""
+        path = tmp_path / "catalog.jsonl"
+        path.write_text(json.dumps(make_product(1, **fields)), encoding="utf-8")
+        service = ProductService()
+
+        progress = CatalogImporter(service).import_jsonl(str(path))
+
+        assert progress.rows_rejected == 1
+        assert service.products[0]["name"] == "Laptop"
+
+    def test_import_jsonl_accepts_integral_numbers(self, tmp_path):
+        """Verifica que 3.0 es un stock válido y 10 un precio válido"""
+        path = tmp_path / "catalog.jsonl"
+        path.write_text(
+            json.dumps(make_product(7, stock=3.0, price=10)), encoding="utf-8"
+        )
+        service = ProductService()
+
+        progress = CatalogImporter(service).import_jsonl(str(path))
+
+        assert progress.rows_imported == 1
+        assert service.products[-1]["stock"] == 3
+        assert isinstance(service.products[-1]["price"], float)
+
+    @pytest.mark.parametrize("line", ["{not json", "[1, 2]", "7"])
+    def test_import_jsonl_rejects_malformed_lines(self, tmp_path, line):
+        """Verifica que una línea rota o que no es un objeto no aborta la importación"""
+        path = tmp_path / "catalog.jsonl"
+        path.write_text(
+            "\n".join([line, json.dumps(make_product(3))]), encoding="utf-8"
+        )
+        service = ProductService()
+
+        progress = CatalogImporter(service).import_jsonl(str(path))
+
+        assert (progress.rows_read, progress.rows_rejected) == (2, 1)
+        assert progress.errors[0].startswith("Fila 1:")
+        assert [p["id"] for p in service.products] == [1, 2, 3]
+
+    def test_iter_import_reports_progress_per_chunk(self):
+        """Verifica que el importador avanza bloque a bloque"""
+        service = ProductService()
+        importer = CatalogImporter(service, chunk_size=2)
+        rows = (make_product(product_id) for product_id in range(10, 15))
+
+        chunks = [progress.rows_imported for progress in importer.iter_import(rows)]
+
+        assert chunks == [2, 4, 5]
+        assert importer.progress.chunks == 3
+        assert importer.progress.rows_per_second > 0
+
+
+class TestSortedPriceIndex:
+    """Tests para el índice ordenado por precio"""
+
+    def make_service(self, catalog_class=ProductCatalog):
+        categories = ["Electronics", "Accessories"]
+        products = [
+            make_product(product_id, category=categories[product_id % 2])
+            for product_id in range(1, 11)
+        ]
+        return ProductService(catalog_class(products))
+
+    def test_price_range_is_lazy_and_sorted(self):
+        """Verifica el rango de precios como iterador ordenado"""
+        service = self.make_service()
+        matches = service.find_products_in_price_range(20, 50)
+
+        assert not isinstance(matches, list)
+        assert [p["id"] for p in matches] == [2, 3, 4, 5]
+
+    def test_price_updates_during_iteration(self):
+        """Verifica que cambiar precios mientras se itera no salta ni repite productos"""
+        service = self.make_service()
+        seen = []
+
+        for product in service.find_products_in_price_range(10, 50):
+            seen.append((product["id"], product["price"]))
+            service.update_price(product["id"], product["price"] + 100)
+        for product in service.find_cheapest_products(3):
+            service.update_price(product["id"], 1)
+
+        assert seen == [(1, 10), (2, 20), (3, 30), (4, 40), (5, 50)]
+        assert [p["id"] for p in service.find_cheapest_products(4)] == [6, 7, 8, 9]
+
+    def test_cheapest_by_category(self):
+        """Verifica el top-N más barato de una categoría"""
+        service = self.make_service()
+        cheapest = service.find_cheapest_products(3, category="Accessories")
+        assert [p["id"] for p in cheapest] == [1, 3, 5]
+        assert list(service.find_cheapest_products(3, category="Toys")) == []
+
+    def test_index_follows_price_updates(self):
+        """Verifica que el índice se actualiza al cambiar el precio"""
+        service = self.make_service()
+        service.update_price(10, 5)
+
+        assert [p["id"] for p in service.find_cheapest_products(2)] == [10, 1]
+        assert [p["id"] for p in service.find_products_in_price_range(95, 200)] == []
+
+    @pytest.mark.parametrize("catalog_class", [ProductCatalog, ColumnarProductCatalog])
+    def test_index_uses_discounted_price(self, catalog_class):
+        """Verifica que el precio con descuento tiene prioridad en el índice"""
+        service = self.make_service(catalog_class)
+        service.apply_bulk_discount([9, 10], 0.1)
+
+        assert [p["id"] for p in service.find_cheapest_products(3)] == [9, 1, 10]
+        electronics = service.find_products_in_price_range(0, 10, "Electronics")
+        assert [p["id"] for p in electronics] == [10]
+
+
+class TestLowStockWatcher:
+    """Tests para las alertas incrementales de stock bajo"""
+
+    def test_alert_fires_only_when_threshold_is_crossed(self):
+        """Verifica que la alerta salta una sola vez al cruzar el umbral"""
+        service = ProductService()
+        alerts = []
+        service.watch_low_stock(40, alerts.append, product_id=1)
+
+        service.reserve(1, 5)
+        assert alerts == []
+        service.reserve(1, 6)
+        service.reserve(1, 1)
+
+        assert len(alerts) == 1
+        assert alerts[0].threshold == 40
+        assert alerts[0].stock == 39
+
+    def test_category_thresholds_and_unsubscribe(self):
+        """Verifica umbrales por categoría y la baja de suscripciones"""
+        service = ProductService()
+        alerts = []
+        subscription_id = service.watch_low_stock(
+            150, alerts.append, category="Accessories"
+        )
+        service.watch_low_stock(100, alerts.append, category="Accessories")
+
+        service.apply_stock_adjustments([(2, 120, 1.0), (1, 40, 1.0)])
+        assert sorted(alert.threshold for alert in alerts) == [100, 150]
+
+        assert service.unwatch_low_stock(subscription_id)
+        assert not service.unwatch_low_stock(subscription_id)
+
+    def test_bulk_updates_fire_alerts(self):
+        """Verifica que el reprecio masivo también dispara alertas"""
+        service = ProductService(ColumnarProductCatalog([make_product(1)]))
+        alerts = []
+        service.watch_low_stock(10, alerts.append, product_id=1)
+
+        service.apply_bulk_discount([1], 0.5, [95])
+        assert [alert.stock for alert in alerts] == [5]
+
+    def test_subscription_requires_single_target(self):
+        """Verifica que la suscripción exige producto o categoría"""
+        service = ProductService()
+        with pytest.raises(ValueError):
+            service.watch_low_stock(10, print)
+
+
+class TestProductViews:
+    """Tests para los resultados sin copia del servicio de productos"""
+
+    def test_view_is_read_only_and_overrides_discount(self):
+        """Verifica que la vista expone el descuento sin copiar el producto"""
+        service = ProductService()
+        view = service.find_product_by_id_and_update_stock_and_calculate_discount_and_send_notification(
+            1, 5, 0.8, copy_result=False
+        )
+
+        assert view["discounted_price"] == 960
+        assert view["stock"] == 45
+        assert dict(view)["name"] == "Laptop"
+        assert service.products[0]["discounted_price"] is None
+        with pytest.raises(TypeError):
+            view["stock"] = 0
+
+    def test_view_matches_copy(self):
+        """Verifica que la vista y la copia tienen el mismo contenido"""
+        service = ProductService()
+        update = (
+            service.find_product_by_id_and_update_stock_and_calculate_discount_and_send_notification
+        )
+        copy = update(2, 0, 0.5)
+        view = update(2, 0, 0.5, copy_result=False)
+        assert view == copy
+
+    def test_price_only_update(self):
+        """Verifica la actualización que solo devuelve el precio con descuento"""
+        service = ProductService()
+        assert service.update_stock_and_get_discounted_price(2, 10, 0.5) == 12.5
+        assert service.products[1]["stock"] == 190
+        assert service.update_stock_and_get_discounted_price(99, 1, 0.5) is None
+
+
+class TestParallelRepricing:
+    """Tests para el reprecio multiproceso con memoria compartida"""
+
+    def make_products(self):
+        return [
+            make_product(product_id, price=product_id * 1.1)
+            for product_id in range(1, 51)
+        ]
+
+    def test_parallel_matches_single_process(self):
+        """Verifica que el resultado multiproceso es idéntico al de un proceso"""
+        single = ProductService(ColumnarProductCatalog(self.make_products()))
+        parallel = ProductService(ColumnarProductCatalog(self.make_products()))
+
+        single.reprice_catalog(0.83)
+        parallel.reprice_catalog(0.83, workers=3)
+
+        assert parallel.products == single.products
+        assert parallel.products[6]["discounted_price"] == 7 * 1.1 * 0.83
+
+    def test_dict_catalog_reprices_all_products(self):
+        """Verifica el reprecio completo sobre el catálogo de diccionarios"""
+        service = ProductService(ProductCatalog(self.make_products()))
+        service.reprice_catalog(0.5, workers=4)
+
+        assert all(p["discounted_price"] == p["price"] * 0.5 for p in service.products)
+
+    @pytest.mark.parametrize("catalog_class", [ProductCatalog, ColumnarProductCatalog])
+    def test_integer_rate(self, catalog_class):
+        """Verifica que una tasa entera también reprecia el catálogo"""
+        service = ProductService(catalog_class(self.make_products()))
+        service.reprice_catalog(1)
+
+        assert all(p["discounted_price"] == p["price"] for p in service.products)
+
+    def test_small_batch_keeps_index_incremental(self):
+        """Verifica el índice tras un lote pequeño, sin reconstrucción"""
+        service = ProductService(ProductCatalog(self.make_products()))
+        service.apply_bulk_discount([50], 0.01)
+
+        assert [p["id"] for p in service.find_cheapest_products(2)] == [50, 1]
+
+    def test_price_index_is_rebuilt(self):
+        """Verifica que el índice de precios refleja el reprecio"""
+        service = ProductService(ColumnarProductCatalog(self.make_products()))
+        service.update_price(50, 0.5)
+        service.reprice_catalog(0.5, workers=2)
+
+        assert [p["id"] for p in service.find_cheapest_products(2)] == [50, 1]
+
+
+class TestVersionedProductCatalog:
+    """Tests para las versiones inmutables (MVCC) del catálogo"""
+
+    def make_service(self):
+        products = [make_product(product_id) for product_id in (1, 2, 5000)]
+        return ProductService(VersionedProductCatalog(products))
+
+    def test_snapshot_is_isolated_from_writes(self):
+        """Verifica que una foto fija no ve escrituras posteriores"""
+        service = self.make_service()
+        snapshot = service.snapshot()
+
+        service.reserve(1, 30)
+
+        assert snapshot.get(1)["stock"] == 100
+        assert service.snapshot().get(1)["stock"] == 70
+        assert service.snapshot().version == snapshot.version + 1
+        with pytest.raises(TypeError):
+            snapshot.get(1)["stock"] = 0
+
+    def test_unchanged_chunks_are_shared(self):
+        """Verifica que solo se copia el bloque modificado"""
+        service = self.make_service()
+        before = service.snapshot()
+        service.update_price(1, 5)
+        after = service.snapshot()
+
+        assert before._chunks[0] is not after._chunks[0]
+        assert before._chunks[4] is after._chunks[4]
+
+    def test_old_versions_are_reclaimed(self):
+        """Verifica que las versiones sin lectores se liberan"""
+        catalog = VersionedProductCatalog([make_product(1)])
+        service = ProductService(catalog)
+        pinned = service.snapshot()
+        for _ in range(10):
+            service.reserve(1, 1)
+        gc.collect()
+
+        assert catalog.live_versions() == 2
+        assert pinned.get(1)["stock"] == 100
+
+    def test_readers_never_see_partial_batches(self):
+        """Verifica que un lote se publica como una sola versión"""
+        service = self.make_service()
+        torn_reads = []
+
+        def reader():
+            for _ in range(2000):
+                snapshot = service.snapshot()
+                stocks = {snapshot.get(product_id)["stock"] for product_id in (1, 2)}
+                if len(stocks) != 1:
+                    torn_reads.append(stocks)
+
+        thread = threading.Thread(target=reader)
+        thread.start()
+        for _ in range(100):
+            service.apply_bulk_discount([1, 2], 0.9, [1, 1])
+        thread.join()
+
+        assert torn_reads == []
+        assert service.products[0]["stock"] == 0
+
+    def test_concurrent_price_updates_keep_index_sorted(self):
+        """Verifica que escritores concurrentes no corrompen el índice de precios"""
+        products = [make_product(product_id) for product_id in range(1, 401)]
+        catalog = VersionedProductCatalog(products)
+        service = ProductService(catalog)
+
+        def writer(first_id):
+            for round_number in range(20):
+                for product_id in range(first_id, first_id + 50):
+                    service.update_price(
+                        product_id, (product_id * 7 + round_number) % 97
+                    )
+
+        threads = [
+            threading.Thread(target=writer, args=(1 + 50 * i,)) for i in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        expected = sorted((p["price"], p["id"]) for p in service.products)
+        assert catalog._price_index._entries == expected
+
+    def test_index_queries_see_one_version_under_writes(self):
+        """Verifica que las consultas por índice no fallan ni mezclan versiones"""
+        catalog = VersionedProductCatalog([make_product(1, category="A")])
+        errors = []
+        done = threading.Event()
+
+        def reader():
+            while not done.is_set():
+                try:
+                    in_a = list(catalog.find_by_category("A"))
+                    by_name = list(catalog.find_by_name("producto 1"))
+                except RuntimeError as error:
+                    errors.append(error)
+                    return
+                if any(
+                    product is None or product["category"] != "A" for product in in_a
+                ):
+                    errors.append(in_a)
+                if any(product is None for product in by_name):
+                    errors.append(by_name)
+
+        readers = [threading.Thread(target=reader) for _ in range(2)]
+        for thread in readers:
+            thread.start()
+        for product_id in range(2, 3000):
+            catalog.add(make_product(product_id, category="A"))
+            catalog.add(make_product(product_id // 2, category="AB"[product_id % 2]))
+        done.set()
+        for thread in readers:
+            thread.join()
+
+        assert errors == []
+
+
+class TestCoalescedStockWrites:
+    """Tests para el acumulador de deltas de stock"""
+
+    def test_reads_see_pending_deltas(self):
+        """Verifica la lectura de stock publicado + delta pendiente"""
+        service = ProductService()
+        for _ in range(10):
+            service.buffer_stock_change(1, -1)
+
+        assert service.get_stock(1) == 40
+        assert service.products[0]["stock"] == 40
+        assert service.flush_stock_changes() == 0
+        assert service.get_stock(1) == 40
+
+    def test_queries_see_pending_deltas(self):
+        """Verifica que las búsquedas y actualizaciones ven el stock efectivo"""
+        service = ProductService()
+        service.buffer_stock_change(1, -5)
+        assert service.find_products_by_category("Electronics")[0]["stock"] == 45
+
+        service.buffer_stock_change(1, -5)
+        assert next(service.find_products_in_price_range(1000, 1500))["stock"] == 40
+
+        service.buffer_stock_change(1, -5)
+        product = service.find_product_by_id_and_update_stock_and_calculate_discount_and_send_notification(
+            1, 5, 0.9
+        )
+        assert product["stock"] == 30
+        assert service.get_stock(1) == 30
+
+    def test_buffered_changes_fire_low_stock_alerts(self):
+        """Verifica que la alerta salta al acumular, sin esperar al vaciado"""
+        service = ProductService()
+        alerts = []
+        service.watch_low_stock(10, alerts.append, product_id=1)
+
+        service.buffer_stock_change(1, -35)
+        assert alerts == []
+        service.buffer_stock_change(1, -10)
+        assert [alert.stock for alert in alerts] == [5]
+
+        service.flush_stock_changes()
+        assert len(alerts) == 1
+
+    def test_flushes_when_buffer_is_full(self):
+        """Verifica el vaciado automático por tamaño"""
+        applied = []
+        buffer = StockDeltaBuffer(lambda *delta: applied.append(delta), max_pending=3)
+        buffer.add(1, -1)
+        buffer.add(2, -1)
+        assert applied == []
+
+        buffer.add(1, -1)
+        assert applied == [(1, -2), (2, -1)]
+
+    def test_flushes_when_oldest_write_expires(self):
+        """Verifica el vaciado automático por antigüedad"""
+        now = [0.0]
+        applied = []
+        buffer = StockDeltaBuffer(
+            lambda *delta: applied.append(delta),
+            max_delay_seconds=1,
+            clock=lambda: now[0],
+        )
+        buffer.add(1, -2)
+        buffer.add(1, -3)
+        assert applied == []
+
+        now[0] = 1.5
+        assert buffer.read(1, lambda product_id: 10) == 10
+        assert applied == [(1, -5)]
+
+    def test_reservations_account_for_pending_deltas(self):
+        """Verifica que las reservas no venden stock ya descontado"""
+        service = ProductService()
+        service.buffer_stock_change(1, -45)
+
+        assert service.reserve(1, 10) is None
+        assert service.reserve(1, 5) is not None
+
+    def test_delta_cannot_slip_between_flush_and_check(self):
+        """Verifica que un delta concurrente no se pierde durante una reserva"""
+        service = ProductService()
+        racer = threading.Thread(target=service.buffer_stock_change, args=(1, -45))
+        landed_before_check = []
+        lock_for = service._lock_for
+
+        def lock_after_racing(product_id):
+            if racer.ident is None:
+                racer.start()
+                racer.join(0.2)
+                landed_before_check.append(not racer.is_alive())
+            return lock_for(product_id)
+
+        service._lock_for = lock_after_racing
+        reservation = service.reserve(1, 10)
+        racer.join()
+
+        assert landed_before_check == [False]
+        assert reservation is not None
+
+    def test_unknown_product_is_rejected(self):
+        """Verifica que no se acumulan deltas de productos inexistentes"""
+        with pytest.raises(KeyError):
+            ProductService().buffer_stock_change(99, -1)
+
+
+class TestNameSearchIndex:
+    """Tests para la búsqueda de productos por nombre"""
+
+    def make_service(self):
+        service = ProductService()
+        for product_id, name in [
+            (3, "Gaming Laptop"),
+            (4, "Laptop Stand"),
+            (5, "Lamp"),
+        ]:
+            service.add_product(make_product(product_id, name=name))
+        return service
+
+    def test_find_substring(self):
+        """Verifica la búsqueda exacta por subcadena sin distinguir mayúsculas"""
+        service = self.make_service()
+        assert [p["id"] for p in service.find_products_by_name("LAPTOP")] == [1, 3, 4]
+        assert [p["id"] for p in service.find_products_by_name("ou")] == [2]
+        assert service.find_products_by_name("tablet") == []
+
+    def test_fuzzy_prefix_search_is_ranked(self):
+        """Verifica que los prefijos exactos aparecen primero"""
+        service = self.make_service()
+        results = [p["id"] for p in service.search_products_by_name("lapt")]
+        assert results[:2] == [1, 4]
+        assert 3 in results
+
+        typo = [p["id"] for p in service.search_products_by_name("laptpo")]
+        assert typo[0] == 1
+
+    def test_index_follows_renames(self):
+        """Verifica que el índice se actualiza al renombrar productos"""
+        service = self.make_service()
+        service.rename_product(5, "Desk Lamp")
+
+        assert [p["id"] for p in service.find_products_by_name("desk")] == [5]
+        assert service.search_products_by_name("lamp")[0]["name"] == "Desk Lamp"
+        assert service.rename_product(99, "Nada") is None
+
+
+def make_order(order_id, customer_id=1, total=50.0, date=None, status="pending"):
+    return {
+        "id": order_id,
+        "customer_id": customer_id,
+        "items": [{"price": total, "quantity": 1}],
+        "total": total,
+        "date": date or datetime(2024, 1, 1),
+        "status": status,
+    }
+
+
+class TestOrderStore:
+    """Tests para el almacén de órdenes indexado por id"""
+
+    def test_process_get_and_cancel(self):
+        """Verifica el ciclo procesar, consultar y cancelar una orden"""
+        processor = OrderProcessor()
+        processor.process_order(1, [{"price": 100, "quantity": 2}], "credit_card")
+        processor.process_order(2, [{"price": 10, "quantity": 1}], "cash")
+        first, second = processor.get_orders()
+
+        assert processor.get_order(first["id"]) is first
+        assert processor.cancel_order(first["id"])
+        assert not processor.cancel_order(first["id"])
+        assert processor.get_orders() == [second]
+
+    def test_duplicate_ids_are_all_cancelled(self):
+        """Verifica que cancelar un id repetido elimina todas sus órdenes"""
+        store = OrderStore()
+        for order_id in (1, 2, 1):
+            store.add(make_order(order_id))
+
+        assert len(store.remove(1)) == 2
+        assert [order["id"] for order in store] == [2]
+
+    def test_tombstones_are_compacted_preserving_order(self):
+        """Verifica la compactación de lápidas manteniendo el orden"""
+        store = OrderStore()
+        total = OrderStore.COMPACT_MIN_TOMBSTONES * 2
+        for order_id in range(total):
+            store.add(make_order(order_id))
+        for order_id in range(0, total, 2):
+            store.remove(order_id)
+
+        assert len(store._orders) < total
+        assert [order["id"] for order in store] == list(range(1, total, 2))
+        assert store.get(total - 1)["id"] == total - 1
+
+
+class TestOrderDateIndex:
+    """Tests para el índice por fecha y el cursor paginado"""
+
+    def make_store(self, hours):
+        store = OrderStore()
+        for order_id, hour in enumerate(hours):
+            store.add(make_order(order_id, date=datetime(2024, 1, 1, hour)))
+        return store
+
+    def test_range_is_ordered_by_date(self):
+        """Verifica que el rango [since, until) sale ordenado aunque llegue desordenado"""
+        store = self.make_store([5, 1, 3, 2, 8, 3])
+
+        cursor = store.cursor(datetime(2024, 1, 1, 2), datetime(2024, 1, 1, 5))
+
+        assert [order["id"] for order in cursor] == [3, 2, 5]
+
+    def test_cancelled_and_other_status_are_skipped(self):
+        """Verifica que el cursor omite canceladas y filtra por estado"""
+        store = self.make_store([1, 2, 3])
+        store.add(make_order(9, date=datetime(2024, 1, 1, 2), status="shipped"))
+        store.remove(1)
+
+        assert [order["id"] for order in store.cursor()] == [0, 9, 2]
+        assert [order["id"] for order in store.cursor(status="shipped")] == [9]
+
+    def test_pages(self):
+        """Verifica que next_page devuelve páginas hasta agotarse"""
+        store = self.make_store(range(5))
+        cursor = store.cursor(page_size=2)
+
+        pages = [cursor.next_page() for _ in range(4)]
+
+        assert [[order["id"] for order in page] for page in pages] == [
+            [0, 1],
+            [2, 3],
+            [4],
+            [],
+        ]
+
+    def test_index_survives_compaction(self):
+        """Verifica que el índice se reconstruye al compactar lápidas"""
+        total = OrderStore.COMPACT_MIN_TOMBSTONES * 2
+        store = self.make_store([order_id % 24 for order_id in range(total)])
+        for order_id in range(0, total, 2):
+            store.remove(order_id)
+
+        cursor = store.cursor(datetime(2024, 1, 1, 23))
+
+        assert len(store._timestamps) == total // 2
+        assert all(order["id"] % 24 == 23 for order in cursor)
+
+    def test_processor_filters_return_cursor(self):
+        """Verifica que get_orders sin filtros sigue devolviendo una lista"""
+        processor = OrderProcessor()
+        processor.process_order(1, [{"price": 10, "quantity": 1}], "cash")
+        processor.process_order(2, [{"price": 10, "quantity": 1}], "cash")
+
+        assert isinstance(processor.get_orders(), list)
+        page = processor.get_orders(status="pending", page_size=1).next_page()
+        assert [order["customer_id"] for order in page] == [1]
+        assert list(processor.get_orders(since=datetime.now())) == []
+
+
+def generate_ids(worker_id, count=2000):
+    generator = SnowflakeIdGenerator(worker_id)
+    return [generator.next_id() for _ in range(count)]
+
+
+class TestOrderIdGenerator:
+    """Tests para el generador de ids de órdenes"""
+
+    def test_ids_are_unique_across_threads(self):
+        """Verifica que varios hilos nunca obtienen el mismo id"""
+        generator = SnowflakeIdGenerator(worker_id=7)
+        ids = []
+
+        def worker():
+            ids.extend(generator.next_id() for _ in range(5000))
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(set(ids)) == 40_000
+        assert {SnowflakeIdGenerator.worker_of(order_id) for order_id in ids} == {7}
+
+    def test_ids_are_unique_across_processes(self):
+        """Verifica que procesos con distinto worker_id no colisionan"""
+        with multiprocessing.Pool(2) as pool:
+            batches = pool.map(generate_ids, [1, 2])
+
+        assert len(set(batches[0]) | set(batches[1])) == 4000
+        assert batches[0] == sorted(batches[0])
+
+    def test_processor_uses_generator_ids(self):
+        """Verifica que dos órdenes seguidas tienen ids distintos y cancelables"""
+        processor = OrderProcessor(SnowflakeIdGenerator(worker_id=3))
+        for _ in range(2):
+            processor.process_order(1, [{"price": 10, "quantity": 1}], "cash")
+        first, second = processor.get_orders()
+
+        assert first["id"] != second["id"]
+        assert processor.cancel_order(first["id"])
+        assert processor.get_orders() == [second]
+
+    def test_rejects_invalid_worker_id(self):
+        """Verifica que el worker_id debe caber en 10 bits"""
+        with pytest.raises(ValueError):
+            SnowflakeIdGenerator(worker_id=1024)
+
+    def test_default_generator_is_shared_per_process(self):
+        """Verifica que dos procesadores sin generador propio no repiten ids"""
+        items = [{"price": 5.0, "quantity": 1}]
+        first, second = OrderProcessor(), OrderProcessor()
+        for _ in range(100):
+            first.process_order(1, items, "card")
+            second.process_order(1, items, "card")
+
+        orders = list(first.get_orders()) + list(second.get_orders())
+        ids = [order["id"] for order in orders]
+        assert len(set(ids)) == 200
+
+    def test_worker_id_must_be_assigned(self):
+        """Verifica que el worker_id no se deduce del pid del proceso"""
+        with pytest.raises(TypeError):
+            SnowflakeIdGenerator()
+
+
+class TestBatchOrderTotals:
+    """Tests para el cálculo de totales por lotes"""
+
+    def test_batch_matches_scalar_path(self):
+        """Verifica que el lote da exactamente los mismos totales"""
+        orders_items = [
+            [{"price": 19.99, "quantity": 3}, {"price": 0.1, "quantity": 7}],
+            [{"price": 50, "quantity": 2}],
+            [{"price": 33.3, "quantity": 1}, {"price": 70.05, "quantity": 1}],
+            [{"price": 100.01, "quantity": 1}],
+        ]
+        processor = OrderProcessor()
+
+        batch = OrderItemBatch.from_orders(orders_items)
+
+        totals = processor.calculate_totals_batch(batch)
+
+        assert list(totals) == [
+            processor._calculate_total(items) for items in orders_items
+        ]
+        assert totals[1] == 100
+        assert totals[3] == 100.01 * 0.9
+
+    def test_empty_batch(self):
+        """Verifica que un lote vacío no produce totales"""
+        batch = OrderItemBatch.from_orders([])
+        assert len(batch) == 0
+        assert list(OrderProcessor().calculate_totals_batch(batch)) == []
+
+
+class TestOrderWriteAheadLog:
+    """Tests para la persistencia de órdenes con log de escritura anticipada"""
+
+    ITEMS = [{"price": 60.0, "quantity": 2}]
+
+    def test_orders_and_cancellations_survive_restart(self, tmp_path):
+        """Verifica que el replay reconstruye altas y cancelaciones"""
+        path = str(tmp_path / "orders.wal")
+        with OrderWriteAheadLog(path) as wal:
+            processor = OrderProcessor(wal=wal)
+            for customer_id in (1, 2, 3):
+                processor.process_order(customer_id, self.ITEMS, "card")
+            cancelled = processor.get_orders()[1]["id"]
+            assert processor.cancel_order(cancelled)
+            expected = processor.get_orders()
+
+        with OrderWriteAheadLog(path) as wal:
+            restored = OrderProcessor(wal=wal).get_orders()
+
+        assert restored == expected
+        assert [order["customer_id"] for order in restored] == [1, 3]
+        assert restored[0]["date"] == expected[0]["date"]
+
+    def test_group_commit_syncs_once_per_group(self, tmp_path, monkeypatch):
+        """Verifica que se hace un fsync por cada N órdenes"""
+        syncs = []
+        monkeypatch.setattr("os.fsync", syncs.append)
+        wal = OrderWriteAheadLog(str(tmp_path / "orders.wal"), group_commit_size=4)
+        processor = OrderProcessor(wal=wal)
+
+        for customer_id in range(1, 11):
+            processor.process_order(customer_id, self.ITEMS, "card")
+
+        assert len(syncs) == 2
+        processor.close()
+        assert len(syncs) == 3
+
+    def test_group_commit_syncs_after_interval(self, tmp_path, monkeypatch):
+        """Verifica que un grupo incompleto se sincroniza pasados T ms"""
+        syncs = []
+        now = [0.0]
+        monkeypatch.setattr("os.fsync", syncs.append)
+        wal = OrderWriteAheadLog(
+            str(tmp_path / "orders.wal"),
+            group_commit_size=100,
+            group_commit_interval_ms=5,
+            clock=lambda: now[0],
+        )
+        processor = OrderProcessor(wal=wal)
+
+        processor.process_order(1, self.ITEMS, "card")
+        assert syncs == []
+        now[0] = 0.006
+        processor.process_order(2, self.ITEMS, "card")
+        assert len(syncs) == 1
+        processor.close()
+
+    def test_timer_syncs_idle_group(self, tmp_path, monkeypatch):
+        """Verifica que sin más órdenes el grupo se sincroniza pasados T ms"""
+        syncs = []
+        monkeypatch.setattr("os.fsync", syncs.append)
+        path = str(tmp_path / "orders.wal")
+        wal = OrderWriteAheadLog(
+            path, group_commit_size=100, group_commit_interval_ms=1
+        )
+        processor = OrderProcessor(wal=wal)
+
+        processor.process_order(1, self.ITEMS, "card")
+        deadline = time.monotonic() + 1
+        while not syncs and time.monotonic() < deadline:
+            time.sleep(0.005)
+
+        assert len(syncs) == 1
+        assert sum(1 for _ in open(path, "rb")) == 1
+        processor.close()
+        assert len(syncs) == 1
+
+    def test_checkpoint_truncates_log(self, tmp_path):
+        """Verifica que el checkpoint vuelca un snapshot y vacía el log"""
+        path = str(tmp_path / "orders.wal")
+        with OrderWriteAheadLog(path, checkpoint_every=5) as wal:
+            processor = OrderProcessor(wal=wal)
+            for customer_id in range(1, 8):
+                processor.process_order(customer_id, self.ITEMS, "card")
+            expected = processor.get_orders()
+
+        assert sum(1 for _ in open(path, "rb")) == 2
+        with OrderWriteAheadLog(path) as wal:
+            assert OrderProcessor(wal=wal).get_orders() == expected
+
+    def test_log_left_behind_by_checkpoint_is_not_replayed_twice(self, tmp_path):
+        """Verifica que una caída entre snapshot y truncado no duplica órdenes"""
+        path = str(tmp_path / "orders.wal")
+        with OrderWriteAheadLog(path) as wal:
+            processor = OrderProcessor(wal=wal)
+            for customer_id in (1, 2):
+                processor.process_order(customer_id, self.ITEMS, "card")
+            wal.sync()
+            log = open(path, "rb").read()
+            processor.checkpoint()
+        open(path, "wb").write(log)
+
+        with OrderWriteAheadLog(path) as wal:
+            assert len(OrderProcessor(wal=wal).get_orders()) == 2
+
+    def test_torn_last_record_is_discarded(self, tmp_path):
+        """Verifica que una línea escrita a medias no rompe el replay"""
+        path = str(tmp_path / "orders.wal")
+        with OrderWriteAheadLog(path) as wal:
+            OrderProcessor(wal=wal).process_order(1, self.ITEMS, "card")
+        with open(path, "ab") as log:
+            log.write(b'{"op":"add","ord')
+
+        with OrderWriteAheadLog(path) as wal:
+            processor = OrderProcessor(wal=wal)
+            processor.process_order(2, self.ITEMS, "card")
+        with OrderWriteAheadLog(path) as wal:
+            orders = OrderProcessor(wal=wal).get_orders()
+
+        assert [order["customer_id"] for order in orders] == [1, 2]
+
+
+class TestAsyncOrderProcessor:
+    """Tests para el procesador de órdenes asíncrono"""
+
+    ITEMS = [{"price": 60.0, "quantity": 2}]
+
+    def test_reuses_validation_and_totals(self):
+        """Verifica que valida y calcula igual que el procesador síncrono"""
+        logged = []
+
+        async def log(order):
+            logged.append(order["total"])
+
+        async def run():
+            async with AsyncOrderProcessor(log=log) as processor:
+                assert await processor.process_order(1, self.ITEMS, "card")
+                assert not await processor.process_order(0, self.ITEMS, "card")
+                assert not await processor.process_order(1, [], "card")
+            return processor
+
+        processor = asyncio.run(run())
+
+        assert [order["total"] for order in processor.get_orders()] == [108.0]
+        assert logged == [108.0]
+
+    def test_load_with_slow_sink_applies_backpressure(self):
+        """Verifica 10k envíos concurrentes con concurrencia y cola acotadas"""
+        persisted = []
+        backlog = []
+
+        async def persist(order):
+            await asyncio.sleep(0)
+            persisted.append(order["id"])
+            backlog.append(len(processor._store) - len(persisted))
+
+        async def log(order):
+            pass
+
+        processor = AsyncOrderProcessor(
+            persist=persist, log=log, max_concurrency=50, sink_queue_size=10
+        )
+
+        async def run():
+            async with processor:
+                await asyncio.gather(
+                    *(
+                        processor.process_order(i, self.ITEMS, "card")
+                        for i in range(1, 10_001)
+                    )
+                )
+
+        asyncio.run(run())
+
+        # ✅ Lo guardado y aún no persistido no supera la cola más un envío por hueco
+        assert max(backlog) <= 10 + 50
+        assert sorted(persisted) == sorted(o["id"] for o in processor.get_orders())
+        assert len(persisted) == 10_000
+
+    def test_sink_errors_do_not_stop_processing(self):
+        """Verifica que un fallo del hook no detiene el consumidor"""
+
+        async def persist(order):
+            if order["customer_id"] == 1:
+                raise IOError("disco lleno")
+
+        async def log(order):
+            pass
+
+        async def run():
+            async with AsyncOrderProcessor(persist=persist, log=log) as processor:
+                await processor.process_order(1, self.ITEMS, "card")
+                await processor.process_order(2, self.ITEMS, "card")
+            return processor
+
+        processor = asyncio.run(run())
+
+        assert len(processor.sink_errors) == 1
+        assert len(processor.get_orders()) == 2
+
+
+class TestShardedOrderProcessor:
+    """Tests para el procesamiento de órdenes particionado por cliente"""
+
+    def test_orders_are_routed_by_customer(self):
+        """Verifica el enrutado por cliente y el orden de sus órdenes"""
+        submissions = [
+            (customer_id, [{"price": float(n), "quantity": 1}], "card")
+            for n in range(1, 6)
+            for customer_id in (1, 2, 3, 4)
+        ]
+        submissions.append((0, [{"price": 1.0, "quantity": 1}], "card"))
+
+        with ShardedOrderProcessor(shards=2, batch_size=3) as processor:
+            results = processor.process_orders(submissions)
+            customer_orders = processor.get_orders(customer_id=3)
+            all_orders = processor.get_orders()
+            owner = processor.shard_for(3)
+            stats = processor.customer_stats(3)
+
+        assert results == [True] * 20 + [False]
+        assert [order["total"] for order in customer_orders] == [1, 2, 3, 4, 5]
+        assert len(all_orders) == 20
+        assert (stats.order_count, stats.total_spent) == (5, 15.0)
+        assert {SnowflakeIdGenerator.worker_of(o["id"]) for o in customer_orders} == {
+            owner
+        }
+
+    def test_get_and_cancel_go_to_owning_shard(self):
+        """Verifica que consultar y cancelar por id llega al shard correcto"""
+        with ShardedOrderProcessor(shards=3) as processor:
+            for customer_id in range(1, 7):
+                processor.process_order(
+                    customer_id, [{"price": 5, "quantity": 1}], "cash"
+                )
+            order = processor.get_orders(customer_id=5)[0]
+
+            assert processor.get_order(order["id"]) == order
+            assert processor.cancel_order(order["id"])
+            assert not processor.cancel_order(order["id"])
+            assert processor.get_orders(customer_id=5) == []
+            assert len(processor.get_orders()) == 5
+
+    def test_customer_orders_apply_filters(self):
+        """Verifica los filtros sobre las órdenes de un cliente"""
+        with ShardedOrderProcessor(shards=2) as processor:
+            for price in (5, 10, 15):
+                processor.process_order(4, [{"price": price, "quantity": 1}], "card")
+            first = processor.get_orders(customer_id=4)[0]
+            processor.cancel_order(first["id"])
+            processor.process_order(8, [{"price": 1, "quantity": 1}], "card")
+
+            orders = processor.get_orders(customer_id=4, status="pending")
+            future = processor.get_orders(
+                customer_id=4, since=datetime.now() + timedelta(days=1)
+            )
+
+        assert [order["total"] for order in orders] == [10, 15]
+        assert future == []
+
+    def test_worker_errors_are_raised_in_parent(self):
+        """Verifica que un ítem inválido no rompe el shard ni el cierre"""
+        processor = ShardedOrderProcessor(shards=2)
+        good = [{"price": 5.0, "quantity": 1}]
+
+        with pytest.raises(KeyError):
+            processor.process_orders(
+                [(1, good, "card"), (2, [{"quantity": 1}], "card")]
+            )
+
+        assert processor.process_order(1, good, "card")
+        assert processor.customer_stats(1).order_count == 2
+        processor.close()
+
+
+class TestOrderRecord:
+    """Tests para las órdenes compactas con __slots__"""
+
+    ITEMS = [{"price": 60.0, "quantity": 2}, {"price": 5.0, "quantity": 1}]
+
+    def test_record_reads_like_an_order(self):
+        """Verifica que el registro compacto se usa como un Order"""
+        order = make_order(7, date=datetime(2024, 5, 1))
+        record = OrderRecord.from_order(order)
+
+        assert record == order
+        assert dict(record) == order
+        assert record["items"] == [{"price": 50.0, "quantity": 1}]
+        assert not hasattr(record, "__dict__")
+        with pytest.raises(KeyError):
+            record["missing"]
+
+    def test_compact_processor_keeps_existing_behaviour(self, tmp_path):
+        """Verifica procesar, consultar, cancelar y persistir en modo compacto"""
+        path = str(tmp_path / "orders.wal")
+        with OrderWriteAheadLog(path) as wal:
+            processor = OrderProcessor(wal=wal, compact_orders=True)
+            processor.process_order(1, self.ITEMS, "card")
+            processor.process_order(2, self.ITEMS, "card")
+            first, second = processor.get_orders()
+
+            assert isinstance(first, OrderRecord)
+            assert first["total"] == 112.5
+            assert first["items"] == self.ITEMS
+            assert processor.cancel_order(first["id"])
+            processor.checkpoint()
+
+        with OrderWriteAheadLog(path) as wal:
+            restored = OrderProcessor(wal=wal, compact_orders=True).get_orders()
+
+        assert restored == [second]
+        assert isinstance(restored[0], OrderRecord)
+
+
+class TestCustomerStats:
+    """Tests para los agregados por cliente"""
+
+    def test_stats_follow_orders_and_cancellations(self):
+        """Verifica conteo, gasto y última fecha al procesar y cancelar"""
+        processor = OrderProcessor()
+        processor.process_order(1, [{"price": 30, "quantity": 1}], "cash")
+        processor.process_order(2, [{"price": 10, "quantity": 1}], "cash")
+        processor.process_order(1, [{"price": 200, "quantity": 1}], "cash")
+        first, _, last = processor.get_orders()
+
+        assert processor.customer_stats(1) == CustomerStats(2, 210.0, last["date"])
+        assert processor.get_customer_orders(1) == [first, last]
+
+        processor.cancel_order(last["id"])
+        assert processor.customer_stats(1) == CustomerStats(1, 30.0, first["date"])
+
+        processor.cancel_order(first["id"])
+        assert processor.customer_stats(1) == CustomerStats(0, 0.0, None)
+        assert processor.customer_stats(99) == CustomerStats(0, 0.0, None)
+
+    def test_stats_are_rebuilt_on_replay(self, tmp_path):
+        """Verifica que el replay del log reconstruye los agregados"""
+        path = str(tmp_path / "orders.wal")
+        with OrderWriteAheadLog(path) as wal:
+            processor = OrderProcessor(wal=wal)
+            processor.process_order(5, [{"price": 40, "quantity": 2}], "cash")
+            processor.process_order(5, [{"price": 10, "quantity": 1}], "cash")
+            processor.cancel_order(processor.get_orders()[1]["id"])
+            expected = processor.customer_stats(5)
+
+        with OrderWriteAheadLog(path) as wal:
+            assert OrderProcessor(wal=wal).customer_stats(5) == expected
+
+        assert expected.order_count == 1
+        assert expected.total_spent == 80.0
+
+
+class TestColdOrderArchive:
+    """Tests para el nivel frío de órdenes archivadas"""
+
+    ITEMS = [{"price": 30.0, "quantity": 1}]
+
+    def make_processor(self, directory, orders=5, **archive_options):
+        archive = ColdOrderArchive(str(directory), **archive_options)
+        processor = OrderProcessor(archive=archive)
+        for customer_id in range(1, orders + 1):
+            processor.process_order(customer_id, self.ITEMS, "cash")
+        return processor, archive
+
+    def test_old_orders_move_to_segments_and_stay_visible(self, tmp_path):
+        """Verifica que archivar vacía la lista caliente sin perder órdenes"""
+        processor, archive = self.make_processor(tmp_path, segment_size=2)
+        expected = list(processor.get_orders())
+
+        assert processor.archive_older_than(timedelta(days=1)) == 0
+        assert processor.archive_older_than(timedelta(seconds=-1)) == 5
+
+        assert len(processor._store) == 0
+        assert len(list(tmp_path.glob("segment-*.zlib"))) == 3
+        assert processor.get_hot_orders() == []
+        assert list(processor.get_orders()) == expected
+        assert processor.get_orders(page_size=2).next_page() == expected[:2]
+        assert processor.get_order(expected[3]["id"]) == expected[3]
+        assert list(processor.get_orders(until=expected[2]["date"])) == expected[:2]
+
+    def test_hot_and_cold_orders_are_combined(self, tmp_path):
+        """Verifica que las consultas mezclan ambos niveles"""
+        processor, _ = self.make_processor(tmp_path, orders=2)
+        processor.archive_older_than(timedelta(seconds=-1))
+        processor.process_order(1, self.ITEMS, "cash")
+
+        assert [order["customer_id"] for order in processor.get_hot_orders()] == [1]
+        assert [order["customer_id"] for order in processor.get_orders()] == [1, 2, 1]
+        assert [order["customer_id"] for order in processor.orders] == [1, 2, 1]
+        assert processor.customer_stats(1).order_count == 2
+        assert len(processor.get_customer_orders(1)) == 1
+        assert len(processor.get_customer_orders(1, include_archived=True)) == 2
+
+    def test_cancel_archived_order_survives_reopen(self, tmp_path):
+        """Verifica la cancelación en frío con lápidas persistentes"""
+        processor, _ = self.make_processor(tmp_path, orders=3)
+        processor.archive_older_than(timedelta(seconds=-1))
+        cancelled = list(processor.get_orders())[1]
+
+        assert processor.cancel_order(cancelled["id"])
+        assert not processor.cancel_order(cancelled["id"])
+        assert processor.get_order(cancelled["id"]) is None
+        assert processor.customer_stats(2).order_count == 0
+
+        reopened = OrderProcessor(archive=ColdOrderArchive(str(tmp_path)))
+        history = reopened.get_orders()
+        assert [order["customer_id"] for order in history] == [1, 3]
+        assert reopened.customer_stats(1).total_spent == 30.0
+        assert reopened.customer_stats(2).order_count == 0
+
+    def test_customer_aggregates_are_read_from_manifest(self, tmp_path):
+        """Verifica que reabrir no recorre los segmentos archivados"""
+        processor, _ = self.make_processor(tmp_path, orders=2)
+        processor.process_order(1, [{"price": 10.0, "quantity": 1}], "cash")
+        processor.archive_older_than(timedelta(seconds=-1))
+        expected = processor.customer_stats(1)
+
+        reopened = ColdOrderArchive(str(tmp_path))
+        reopened._load = None
+
+        assert reopened.customer_stats(1) == expected
+        assert (expected.order_count, expected.total_spent) == (2, 40.0)
+
+    def test_cancelling_latest_archived_order_updates_last_date(self, tmp_path):
+        """Verifica la última fecha tras cancelar la orden archivada más reciente"""
+        processor, _ = self.make_processor(tmp_path, orders=1)
+        processor.process_order(1, self.ITEMS, "cash")
+        processor.archive_older_than(timedelta(seconds=-1))
+        first, latest = processor.get_orders()
+
+        assert processor.customer_stats(1).last_order_date == latest["date"]
+        assert processor.cancel_order(latest["id"])
+        assert processor.customer_stats(1).last_order_date == first["date"]
+
+    def test_interrupted_archive_is_completed_on_replay(self, tmp_path):
+        """Verifica que una caída a mitad del archivado no duplica órdenes"""
+        path = str(tmp_path / "orders.wal")
+        archive_dir = tmp_path / "cold"
+        with OrderWriteAheadLog(path) as wal:
+            processor = OrderProcessor(
+                wal=wal, archive=ColdOrderArchive(str(archive_dir))
+            )
+            for customer_id in (1, 2, 3):
+                processor.process_order(customer_id, self.ITEMS, "cash")
+            processor.checkpoint = lambda: None
+            processor.archive_older_than(timedelta(seconds=-1))
+
+        with OrderWriteAheadLog(path) as wal:
+            restored = OrderProcessor(
+                wal=wal, archive=ColdOrderArchive(str(archive_dir))
+            )
+
+            assert restored.get_hot_orders() == []
+            assert len(list(restored.get_orders())) == 3
+            assert restored.customer_stats(2).order_count == 1
+
+    def test_block_cache_is_bounded(self, tmp_path):
+        """Verifica que la caché LRU no guarda más bloques de los configurados"""
+        processor, archive = self.make_processor(
+            tmp_path, orders=6, segment_size=4, block_size=1, cached_blocks=2
+        )
+        ids = [order["id"] for order in processor.get_orders()]
+        processor.archive_older_than(timedelta(seconds=-1))
+
+        assert [processor.get_order(order_id)["id"] for order_id in ids] == ids
+        assert len(archive._cache) == 2
+
+
+class TestIdempotencyGuard:
+    """Tests para la supresión de envíos duplicados"""
+
+    ITEMS = [{"price": 30.0, "quantity": 1}]
+
+    def test_retry_is_rejected_and_new_token_is_accepted(self):
+        """Verifica que un reintento idéntico no crea otra orden"""
+        processor = OrderProcessor(idempotency=IdempotencyGuard())
+
+        assert processor.process_order(1, self.ITEMS, "cash", client_token="a")
+        assert not processor.process_order(1, self.ITEMS, "cash", client_token="a")
+        assert processor.process_order(1, self.ITEMS, "cash", client_token="b")
+        assert processor.process_order(2, self.ITEMS, "cash", client_token="a")
+        assert len(processor.get_orders()) == 3
+
+    def test_orders_without_token_are_not_deduplicated(self):
+        """Verifica que sin token se aceptan pedidos repetidos legítimos"""
+        processor = OrderProcessor(idempotency=IdempotencyGuard())
+
+        assert processor.process_order(1, self.ITEMS, "cash")
+        assert processor.process_order(1, self.ITEMS, "cash")
+        assert len(processor.get_orders()) == 2
+
+    def test_filters_rotate_when_full(self):
+        """Verifica que superar la capacidad no satura los filtros"""
+        processor = OrderProcessor(
+            idempotency=IdempotencyGuard(
+                recent_keys=100, window_capacity=1_000, false_positive_rate=1e-6
+            )
+        )
+        accepted = [
+            processor.process_order(1, self.ITEMS, "cash", client_token=f"t-{token}")
+            for token in range(20_000)
+        ]
+
+        assert all(accepted)
+        assert not processor.process_order(
+            1, self.ITEMS, "cash", client_token="t-19999"
+        )
+
+    def test_bloom_filter_covers_evicted_recent_keys(self):
+        """Verifica que el filtro de Bloom recuerda lo que salió de la caché"""
+        guard = IdempotencyGuard(recent_keys=2)
+        keys = [IdempotencyGuard.key(1, self.ITEMS, str(token)) for token in range(5)]
+        for key in keys:
+            guard.remember(key)
+
+        assert len(guard._recent) == 2
+        assert all(guard.is_duplicate(key) for key in keys)
+
+    def test_keys_expire_after_window(self):
+        """Verifica que las claves caducan tras dos rotaciones de ventana"""
+        now = [0.0]
+        guard = IdempotencyGuard(window_seconds=10, clock=lambda: now[0])
+        key = IdempotencyGuard.key(1, self.ITEMS, "a")
+        guard.remember(key)
+
+        now[0] = 15
+        assert guard.is_duplicate(key)
+        now[0] = 25
+        assert not guard.is_duplicate(key)
+
+    def test_false_positive_rate_is_bounded(self):
+        """Verifica que la tasa de falsos positivos ronda la configurada"""
+        guard = IdempotencyGuard(
+            recent_keys=0, window_capacity=5_000, false_positive_rate=0.01
+        )
+        for token in range(5_000):
+            guard.remember(IdempotencyGuard.key(1, self.ITEMS, f"seen-{token}"))
+
+        false_positives = sum(
+            guard.is_duplicate(IdempotencyGuard.key(1, self.ITEMS, f"new-{token}"))
+            for token in range(10_000)
+        )
+
+        assert false_positives < 10_000 * 0.01 * 2
+
+
+class TestRollingMetrics:
+    """Tests para las métricas deslizantes de órdenes"""
+
+    def make_processor(self):
+        now = [time.time()]
+        processor = OrderProcessor(metrics=OrderMetrics(clock=lambda: now[0]))
+        processor.process_order(1, [{"price": 200, "quantity": 1}], "cash")
+        processor.process_order(2, [{"price": 30, "quantity": 1}], "cash")
+        processor.process_order(3, [{"price": 60, "quantity": 1}], "cash")
+        return processor, now
+
+    def test_metrics_follow_orders(self):
+        """Verifica pedidos por segundo, ingresos y proporción con descuento"""
+        processor, _ = self.make_processor()
+
+        assert processor.rolling_metrics() == RollingMetrics(
+            orders_per_second=3 / 60,
+            revenue_per_minute=270.0,
+            revenue_per_hour=270.0,
+            discounted_share=1 / 3,
+        )
+
+    def test_cancellation_is_subtracted(self):
+        """Verifica que cancelar resta la orden de sus ventanas"""
+        processor, _ = self.make_processor()
+        discounted = processor.get_orders()[0]
+
+        processor.cancel_order(discounted["id"])
+        metrics = processor.rolling_metrics()
+
+        assert metrics.revenue_per_minute == 90.0
+        assert metrics.discounted_share == 0.0
+
+    def test_windows_slide_with_the_clock(self):
+        """Verifica que las órdenes salen de cada ventana al caducar"""
+        processor, now = self.make_processor()
+
+        now[0] += 61
+        metrics = processor.rolling_metrics()
+        assert (metrics.revenue_per_minute, metrics.revenue_per_hour) == (0.0, 270.0)
+
+        processor.cancel_order(processor.get_orders()[1]["id"])
+        assert processor.rolling_metrics().revenue_per_hour == 240.0
+
+        now[0] += 3_600
+        metrics = processor.rolling_metrics()
+        assert (metrics.revenue_per_hour, metrics.discounted_share) == (0.0, 0.0)
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])